@@ -1,54 +1,171 @@
+import os
 import streamlit as st
 import pandas as pd
-import pymysql
-import os
-from dotenv import load_dotenv
 from datetime import datetime, timedelta
 import matplotlib.pyplot as plt
+from matplotlib.colors import LogNorm
 import seaborn as sns
+from weather.db import (
+    get_pool, bootstrap_db, date_range_condition, load_data_version, read_frame, PAST_TABLE_NAME, FUTURE_TABLE_NAME,
+)
+from weather.cache import get_query_cache, QUERY_CACHE_TTL
+from weather.schema import STATIONS_TABLE, STATION_COLUMNS, ROLLUP_MEASURES
+from weather.rollups import load_rollup_summary
+from weather.export import export_frame, EXPORT_FORMATS
+from weather.catalog import StationCatalog, name_tokens
+from weather.plots import (
+    finite_xy, bin_points, stratified_sample, PLOT_RAW_POINTS, PLOT_SAMPLE_POINTS, PLOT_BINS,
+)
+
+# 측정값 열
+MEASURE_COLUMNS = ['tavg', 'tmin', 'tmax', 'prcp', 'snow', 'avg_wdir', 'wspd', 'pres', 'tsun', 'avg_rhum', 'avg_dwpt']
+
+# 조회 가능한 전체 열 (Station_ID, Date는 항상 포함)
+ALL_COLUMNS = ['Station_ID'] + STATION_COLUMNS + ['Date'] + MEASURE_COLUMNS
+
+
+# 이름 검색 조건 (카탈로그의 search_name과 같이 모든 검색어가 이름의 어떤 단어의 접두어)
+def name_prefix_conditions(keyword):
+    tokens = name_tokens(keyword)
+    if not tokens:
+        return ["1 = 0"], []
+    # 검색어는 영숫자뿐이라 정규식 이스케이프가 필요 없음
+    return ["LOWER(s.Station_Name) REGEXP %s"] * len(tokens), [f"(^|[^0-9a-z]){token}" for token in tokens]
 
-# 환경변수 로드
-load_dotenv()
-
-# 환경변수에서 AWS RDS 정보 가져오기
-DB_HOST = os.getenv("DB_HOST")  # AWS RDS 엔드포인트
-DB_USER = os.getenv("DB_USER")  # 사용자 이름
-DB_PASSWORD = os.getenv("DB_PASSWORD")  # 비밀번호
-DB_NAME = os.getenv("DB_NAME")  # 데이터베이스 이름
-
-# DB 연결 함수
-def get_rds_connection():
-    return pymysql.connect(
-        host=DB_HOST,
-        user=DB_USER,
-        password=DB_PASSWORD,
-        database=DB_NAME,
-        charset="utf8mb4",
-        cursorclass=pymysql.cursors.DictCursor,
-    )
-
-# DB 데이터 조회 함수
-def fetch_from_db_with_filters(conn, table_name, start_date=None, end_date=None):
-    query = f"SELECT * FROM {table_name}"
-    conditions = []
-    if start_date:
-        conditions.append(f"DATE(Date) >= '{start_date}'")
-    if end_date:
-        conditions.append(f"DATE(Date) <= '{end_date}'")
+
+# DB 데이터 조회 함수 (지역/스테이션 이름/스테이션 ID 필터와 열 선택을 SQL로 처리)
+def fetch_from_db_with_filters(conn, table_name, start_date=None, end_date=None,
+                               regions=None, name_keyword=None, columns=None, station_ids=None):
+    """station_ids가 None이 아니면 그 스테이션만 조회 (빈 목록이면 결과 없음)"""
+    columns = [col for col in ALL_COLUMNS if columns is None or col in columns or col in ('Station_ID', 'Date')]
+    select_list = ", ".join(f"s.{col}" if col in STATION_COLUMNS else f"w.{col}" for col in columns)
+
+    query = f"SELECT {select_list} FROM {table_name} w"
+    # 스테이션 열을 조회하거나 필터링할 때만 stations와 조인
+    if regions or name_keyword or any(col in STATION_COLUMNS for col in columns):
+        query += f" LEFT JOIN {STATIONS_TABLE} s ON s.Station_ID = w.Station_ID"
+
+    conditions, params = date_range_condition(start_date, end_date, column="w.Date")
+    if regions:
+        conditions.append(f"s.Region IN ({', '.join(['%s'] * len(regions))})")
+        params.extend(regions)
+    if name_keyword:
+        name_conditions, name_params = name_prefix_conditions(name_keyword)
+        conditions.extend(name_conditions)
+        params.extend(name_params)
+    if station_ids is not None:
+        if station_ids:
+            conditions.append(f"w.Station_ID IN ({', '.join(['%s'] * len(station_ids))})")
+            params.extend(station_ids)
+        else:
+            conditions.append("1 = 0")
     if conditions:
         query += " WHERE " + " AND ".join(conditions)
 
-    with conn.cursor() as cursor:
-        cursor.execute(query)
-        result = cursor.fetchall()
-    return pd.DataFrame(result)
+    return read_frame(conn, query, params, label=table_name)
+
+
+# 필터 선택지용 지역 목록 (자주 바뀌지 않으므로 캐시)
+@st.cache_data(ttl=3600)
+def load_regions():
+    with get_pool().connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute(f"SELECT DISTINCT Region FROM {STATIONS_TABLE} WHERE Region IS NOT NULL ORDER BY Region")
+            return [row['Region'] for row in cursor.fetchall() if row['Region']]
+
+
+# 스테이션 위치/이름 인덱스 (stations 테이블 기준, 세션 간 공유)
+@st.cache_resource(ttl=3600)
+def load_station_catalog():
+    with get_pool().connection() as conn:
+        stations = read_frame(
+            conn, f"SELECT Station_ID, Station_Name, Region, Latitude, Longitude FROM {STATIONS_TABLE}")
+    stations = stations.rename(columns={
+        'Station_Name': 'name', 'Region': 'region', 'Latitude': 'latitude', 'Longitude': 'longitude'})
+    return StationCatalog(stations.set_index('Station_ID'))
+
+# 산점도용 점/격자 계산 (조회 조건, 데이터 버전, 축 단위로 캐시, 데이터 자체는 해시하지 않음)
+@st.cache_data(max_entries=64, ttl=QUERY_CACHE_TTL, show_spinner=False)
+def plot_points(data_key, data_version, x_col, y_col, mode, _data):
+    x, y = finite_xy(_data, x_col, y_col)
+    if mode == "Density" or (mode == "Auto" and len(x) > PLOT_RAW_POINTS):
+        return {'kind': "density", 'points': len(x), 'bins': bin_points(x, y, PLOT_BINS)}
+    if mode == "Sample":
+        sample_x, sample_y = stratified_sample(x, y, PLOT_SAMPLE_POINTS, PLOT_BINS)
+        return {'kind': "sample", 'points': len(x), 'x': sample_x, 'y': sample_y}
+    return {'kind': "raw", 'points': len(x), 'x': x, 'y': y}
+
+
+# 산점도 그리기 (밀도 모드는 격자만 그리므로 점 수와 무관하게 빠름)
+def draw_scatter(plot, x_col, y_col):
+    fig, ax = plt.subplots(figsize=(8, 4))
+    if plot['kind'] == "density":
+        if plot['bins'] is not None:
+            counts, x_edges, y_edges = plot['bins']
+            mesh = ax.pcolormesh(x_edges, y_edges, counts.T, norm=LogNorm(vmin=1), cmap="viridis", shading='flat')
+            fig.colorbar(mesh, ax=ax, label="rows")
+        ax.set_title(f"{x_col} vs {y_col} (density of {plot['points']} rows)")
+    elif plot['kind'] == "sample":
+        ax.scatter(plot['x'], plot['y'], s=4, alpha=0.4, linewidths=0)
+        ax.set_title(f"{x_col} vs {y_col} ({len(plot['x'])} of {plot['points']} rows, stratified sample)")
+    else:
+        sns.scatterplot(x=plot['x'], y=plot['y'], ax=ax)
+        ax.set_title(f"{x_col} vs {y_col}")
+    ax.set_xlabel(x_col)
+    ax.set_ylabel(y_col)
+    return fig
+
+
+# 다운로드 영역 (파일은 요청할 때만 만들고, 같은 조회 조건/데이터 버전/형식이면 재사용)
+@st.fragment
+def show_download(filtered_data):
+    st.subheader("Download Data")
+    export_format = st.selectbox("Format", options=list(EXPORT_FORMATS), key="export_format")
+    data_key = st.session_state.get('data_key')
+    data_version = st.session_state.get('data_version')
+    if st.button("Prepare Download"):
+        with st.spinner("Preparing file..."):
+            path = export_frame(filtered_data, data_key, export_format, data_version)
+            st.session_state['export'] = (data_key, data_version, export_format, path)
+
+    export = st.session_state.get('export')
+    if export and export[:3] == (data_key, data_version, export_format) and os.path.exists(export[3]):
+        extension, mime = EXPORT_FORMATS[export_format]
+        with open(export[3], "rb") as f:
+            st.download_button(label=f"Download as {export_format}", data=f,
+                               file_name=f"filtered_weather_data.{extension}", mime=mime)
+
+
+# 시각화 영역 (축/모드를 바꾸면 페이지 전체가 아니라 이 부분만 다시 실행)
+@st.fragment
+def show_visualization(filtered_data, numeric_columns):
+    st.subheader("Data Visualization")
+    st.write("Select columns to visualize")
+
+    x_col = st.selectbox("X-axis column", options=numeric_columns, index=0, key="x_axis_col")
+    y_col = st.selectbox("Y-axis column", options=numeric_columns, index=min(1, len(numeric_columns) - 1), key="y_axis_col")
+    plot_mode = st.radio(
+        "Rendering", ("Auto", "Density", "Sample", "Raw"), horizontal=True, key="plot_mode",
+        help=f"Auto draws raw points up to {PLOT_RAW_POINTS} rows and a density grid above that.")
+
+    if x_col and y_col:
+        plot = plot_points(st.session_state.get('data_key'), st.session_state.get('data_version'),
+                           x_col, y_col, plot_mode, filtered_data)
+        st.pyplot(draw_scatter(plot, x_col, y_col), clear_figure=True)
+
 
 # Streamlit App
 st.title("AWS RDS Weather Data Viewer")
 
+# DB 초기화 (프로세스당 한 번, Parsing 페이지를 열기 전에도 스키마가 최신이어야 조회 가능)
+try:
+    bootstrap_db()
+except Exception as e:
+    st.error(f"An error occurred while connecting to AWS RDS: {e}")
+
 # 테이블 이름 설정
-past_table_name = "past_weather"
-future_table_name = "future_weather"
+past_table_name = PAST_TABLE_NAME
+future_table_name = FUTURE_TABLE_NAME
 
 # 사이드바에서 데이터베이스 선택
 st.sidebar.title("Database Selection")
@@ -65,79 +182,103 @@ st.sidebar.title("Date Filter")
 start_date = st.sidebar.date_input("Start Date", datetime.now().date() - timedelta(days=7))
 end_date = st.sidebar.date_input("End Date", datetime.now().date())
 
-# Fetch Data 버튼
-if st.sidebar.button("Fetch Data"):
-    try:
-        with get_rds_connection() as conn:
-            # 데이터 가져오기
-            st.info("Fetching data from AWS RDS...")
-            with st.spinner("Loading data..."):
-                data = fetch_from_db_with_filters(conn, table_name, start_date, end_date)
-                if not data.empty:
-                    st.session_state['data'] = data  # 데이터 캐시 저장
-                    st.success(f"Data fetched successfully! [total {len(data)} rows]")
-                else:
-                    st.warning("No data found for the selected filters.")
-    except Exception as e:
-        st.error(f"An error occurred while connecting to AWS RDS: {e}")
+# Filter by State (SQL WHERE 절로 적용)
+st.sidebar.title("Filter by State")
+try:
+    selected_states = st.sidebar.multiselect("Select States", options=load_regions())
+except Exception as e:
+    st.warning(f"No regions available for filtering: {e}")
+    selected_states = []
 
-# 캐시된 데이터가 있는 경우에만 추가 필터링 및 조회 가능
-if 'data' in st.session_state and not st.session_state['data'].empty:
-    st.subheader("Filter Data")
-    data = st.session_state['data']
+# Additional Filters
+st.sidebar.title("Additional Filters")
+search_keyword = st.sidebar.text_input("Search by Station Name", "", help="Matches the start of words, not text inside a word: 'los ang' finds 'Los Angeles', 'geles' does not")
+near_point = st.sidebar.checkbox("Stations near a point")
+if near_point:
+    near_lat = st.sidebar.number_input("Latitude", min_value=-90.0, max_value=90.0, value=40.71)
+    near_lon = st.sidebar.number_input("Longitude", min_value=-180.0, max_value=180.0, value=-74.01)
+    near_radius = st.sidebar.number_input("Radius (km)", min_value=1.0, value=50.0)
 
-    # Filter by State
-    st.sidebar.title("Filter by State")
+# 이름 검색/위치 필터를 스테이션 ID 목록으로 변환 (인덱스 조회, 카탈로그가 없으면 이름은 같은 규칙의 SQL 조건)
+station_ids = None
+name_keyword = None
+if search_keyword or near_point:
     try:
-        regions = data['Region'].dropna().unique().tolist()
-        regions = sorted(filter(None, regions))  # None 값을 제거하고 정렬
-        selected_states = st.sidebar.multiselect("Select States", options=regions)
-    except KeyError:
-        st.warning("No regions available for filtering.")
-        selected_states = []
-
-    # Additional Filters
-    st.sidebar.title("Additional Filters")
-    search_keyword = st.sidebar.text_input("Search by Station Name", "")
+        catalog = load_station_catalog()
+        matched = catalog.stations.index
+        if search_keyword:
+            matched = catalog.search_name(search_keyword).index
+        if near_point:
+            matched = catalog.within_radius(near_lat, near_lon, near_radius).index.intersection(matched, sort=False)
+        station_ids = matched.tolist()
+        st.sidebar.caption(f"{len(station_ids)} stations match")
+    except Exception as e:
+        st.warning(f"Station index is not available: {e}")
+        name_keyword = search_keyword
 
-    filtered_data = data
+# 조회할 열 선택 (선택한 열만 전송)
+selected_columns = st.sidebar.multiselect("Columns", options=ALL_COLUMNS, default=ALL_COLUMNS)
 
-    # State Filter 적용
-    if selected_states:
-        filtered_data = data[data['Region'].isin(selected_states)]
+# Fetch Data 버튼
+if st.sidebar.button("Fetch Data"):
+    try:
+        # 다른 사용자가 같은 조건으로 조회했다면 캐시된 결과 사용
+        query_filters = (tuple(sorted(selected_states)), name_keyword, tuple(selected_columns),
+                         None if station_ids is None else tuple(sorted(station_ids)))
+        query_cache = get_query_cache()
+        with get_pool().connection() as conn:
+            # CLI/워커 등 다른 프로세스의 기록도 반영되도록 DB의 데이터 버전과 비교
+            data_version = load_data_version(conn, table_name)
+            data = query_cache.get(table_name, start_date, end_date, query_filters, data_version)
+            if data is None:
+                # 데이터 가져오기
+                st.info("Fetching data from AWS RDS...")
+                with st.spinner("Loading data..."):
+                    data = fetch_from_db_with_filters(
+                        conn, table_name, start_date, end_date,
+                        selected_states, name_keyword, selected_columns, station_ids)
+                query_cache.put(table_name, start_date, end_date, data, query_filters, data_version)
+        st.session_state['data'] = data  # 데이터 캐시 저장
+        st.session_state['data_key'] = (table_name, start_date, end_date, query_filters)  # 시각화 캐시 키
+        st.session_state['data_version'] = data_version
+        if not data.empty:
+            st.success(f"Data fetched successfully! [total {len(data)} rows]")
+        else:
+            st.warning("No data found for the selected filters.")
+    except Exception as e:
+        st.error(f"An error occurred while connecting to AWS RDS: {e}")
 
-    # Station Name 검색 적용
-    if search_keyword:
-        filtered_data = filtered_data[filtered_data['Station_Name'].str.contains(search_keyword, case=False, na=False)]
+# 조회된 데이터
+filtered_data = st.session_state.get('data', pd.DataFrame())
+numeric_columns = [col for col in ROLLUP_MEASURES if col in filtered_data]
 
-    # 필터링 결과 표시
+# 필터링 결과 표시
+if 'data' in st.session_state:
     if not filtered_data.empty:
         st.subheader("Filtered Data")
         st.dataframe(filtered_data)
+    else:
+        st.warning("No data matches the selected filters.")
 
-        # 데이터 요약
-        st.subheader("Data Summary")
-        numeric_columns = ['tavg', 'tmin', 'tmax', 'prcp', 'snow', 'avg_wdir', 'pres', 'tsun', 'avg_rhum', 'avg_dwpt']
-        summary = filtered_data[numeric_columns].describe().transpose()
+# 데이터 요약 (스테이션 필터가 없으면 원본 행 대신 (Region, Date) 롤업 테이블에서 계산)
+st.subheader("Data Summary")
+if not search_keyword and not near_point:
+    try:
+        with get_pool().connection() as conn:
+            summary = load_rollup_summary(conn, table_name, start_date, end_date, selected_states)
         st.write(summary)
+    except Exception as e:
+        st.warning(f"Summary is not available: {e}")
+elif numeric_columns and not filtered_data.empty:
+    summary = filtered_data[numeric_columns].describe().transpose()
+    st.write(summary)
+else:
+    st.info("Fetch data to summarize the selected stations.")
 
-        # 데이터 다운로드
-        st.subheader("Download Data")
-        csv = filtered_data.to_csv(index=False)
-        st.download_button(label="Download as CSV", data=csv, file_name="filtered_weather_data.csv", mime="text/csv")
-
-        # 데이터 시각화
-        st.subheader("Data Visualization")
-        st.write("Select columns to visualize")
-
-        x_col = st.selectbox("X-axis column", options=numeric_columns, index=0, key="x_axis_col")
-        y_col = st.selectbox("Y-axis column", options=numeric_columns, index=1, key="y_axis_col")
-
-        if x_col and y_col:
-            fig, ax = plt.subplots(figsize=(8, 4))
-            sns.scatterplot(data=filtered_data, x=x_col, y=y_col, ax=ax)
-            ax.set_title(f"{x_col} vs {y_col}")
-            st.pyplot(fig, clear_figure=True)
-    else:
-        st.warning("No data matches the selected filters.")
+if not filtered_data.empty:
+    # 데이터 다운로드
+    show_download(filtered_data)
 
+    # 데이터 시각화
+    if numeric_columns:
+        show_visualization(filtered_data, numeric_columns)
@@ -0,0 +1,143 @@
+import streamlit as st
+import pandas as pd
+import matplotlib.pyplot as plt
+from weather.metrics import RUNS_FILE, QUERIES_FILE, METRICS_DIR, STAGE_HISTOGRAMS, load_jsonl
+
+# 단계 이름 (차트 범례)
+STAGE_LABELS = {
+    'fetch_seconds': "Fetch",
+    'aggregate_seconds': "Aggregate",
+    'write_seconds': "Write",
+    'commit_seconds': "Commit",
+}
+
+
+# 실행 기록 -> 실행당 한 행의 표
+def runs_to_frame(runs):
+    rows = []
+    for run in runs:
+        row = {
+            'Started': pd.to_datetime(run['started_at']),
+            'Kind': run['kind'],
+            'Table': run['table'],
+            'Elapsed (s)': run['elapsed_seconds'],
+            'Rows/s': run['rows_per_sec'],
+            'Write Rows/s': run['write_rows_per_sec'],
+            'Stations': run['counters'].get('stations_fetched', 0),
+            'Failed': run['counters'].get('stations_failed', 0),
+            'Rows Written': run['counters'].get('rows_written', 0),
+            'Unchanged': run['counters'].get('rows_unchanged', 0),
+            'Errors': run['counters'].get('errors', 0),
+        }
+        for name, label in STAGE_LABELS.items():
+            histogram = run['histograms'][name]
+            row[f"{label} Total (s)"] = histogram['sum']
+            row[f"{label} p50 (s)"] = histogram['p50']
+            row[f"{label} p95 (s)"] = histogram['p95']
+        rows.append(row)
+    return pd.DataFrame(rows)
+
+
+# Streamlit App
+st.title("Ingest Metrics")
+st.write(f"Per-stage metrics from `{METRICS_DIR}` (also exported as Prometheus text files in the same directory).")
+
+st.sidebar.title("Metrics Filter")
+run_count = st.sidebar.number_input("Runs to Show", min_value=1, max_value=500, value=20)
+kinds = st.sidebar.multiselect(
+    "Run Kind", ("past", "future", "retry", "worker", "reaggregate"),
+    default=("past", "future", "retry", "worker", "reaggregate"))
+
+runs = [run for run in load_jsonl(RUNS_FILE, limit=1000) if run['kind'] in kinds][-run_count:]
+
+if not runs:
+    st.info("No ingest runs recorded yet. Metrics are written by the Parsing page and `python -m weather.cli`.")
+else:
+    runs_df = runs_to_frame(runs)
+    latest = runs_df.iloc[-1]
+
+    # 마지막 실행 요약
+    st.subheader("Last Run")
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("Elapsed", f"{latest['Elapsed (s)']:.1f} s")
+    col2.metric("Rows/s", f"{latest['Rows/s'] or 0:.0f}")
+    col3.metric("Stations", f"{latest['Stations']}", delta=f"-{latest['Failed']} failed" if latest['Failed'] else None)
+    col4.metric("Write Rows/s", f"{latest['Write Rows/s'] or 0:.0f}")
+
+    # 병목 단계: 단계별 누적 시간이 가장 큰 단계 (Fetch는 동시 요청 수만큼 겹쳐 있으므로 스레드 시간 기준)
+    stage_totals = {label: latest[f"{label} Total (s)"] for label in STAGE_LABELS.values()}
+    bottleneck = max(stage_totals, key=stage_totals.get)
+    st.write(f"**Largest stage total:** {bottleneck} ({stage_totals[bottleneck]:.1f} s). "
+             f"Fetch time is summed across concurrent requests, Write/Commit run on the writer thread.")
+
+    labels = runs_df['Started'].dt.strftime("%m-%d %H:%M") + " " + runs_df['Kind']
+
+    # 실행별 단계 시간 (누적 막대)
+    st.subheader("Stage Time per Run")
+    fig, ax = plt.subplots(figsize=(10, 4))
+    bottom = pd.Series(0.0, index=runs_df.index)
+    for label in ("Aggregate", "Write", "Fetch"):
+        values = runs_df[f"{label} Total (s)"].fillna(0)
+        ax.bar(labels, values, bottom=bottom, label=label)
+        bottom += values
+    ax.set_ylabel("seconds")
+    ax.legend()
+    ax.tick_params(axis='x', rotation=45)
+    st.pyplot(fig, clear_figure=True)
+
+    # 처리량과 지연 시간 분위수
+    col1, col2 = st.columns(2)
+    with col1:
+        st.subheader("Throughput")
+        fig, ax = plt.subplots(figsize=(6, 4))
+        ax.plot(labels, runs_df['Rows/s'], marker='o', label="Rows/s (wall)")
+        ax.plot(labels, runs_df['Write Rows/s'], marker='o', label="Rows/s (write stage)")
+        ax.set_ylabel("rows/s")
+        ax.legend()
+        ax.tick_params(axis='x', rotation=45)
+        st.pyplot(fig, clear_figure=True)
+    with col2:
+        st.subheader("Latency p95")
+        fig, ax = plt.subplots(figsize=(6, 4))
+        for label in STAGE_LABELS.values():
+            ax.plot(labels, runs_df[f"{label} p95 (s)"], marker='o', label=label)
+        ax.set_ylabel("seconds")
+        ax.legend()
+        ax.tick_params(axis='x', rotation=45)
+        st.pyplot(fig, clear_figure=True)
+
+    st.subheader("Runs")
+    st.dataframe(runs_df.iloc[::-1], hide_index=True)
+
+    # 마지막 실행의 스테이션 수집 지연 분포
+    st.subheader("Fetch Latency Histogram (Last Run)")
+    histogram = runs[-1]['histograms']['fetch_seconds']
+    bucket_labels = [f"≤{bound:g}s" for bound in histogram['buckets']] + ["+Inf"]
+    fig, ax = plt.subplots(figsize=(10, 3))
+    ax.bar(bucket_labels, histogram['counts'])
+    ax.set_ylabel("stations")
+    st.pyplot(fig, clear_figure=True)
+    st.caption(STAGE_HISTOGRAMS['fetch_seconds'])
+
+# DB_Check 조회 지연 시간과 전송량
+st.subheader("DB_Check Queries")
+queries = load_jsonl(QUERIES_FILE, limit=run_count * 10)
+if not queries:
+    st.info("No DB_Check queries recorded yet.")
+else:
+    queries_df = pd.DataFrame(queries)
+    queries_df['at'] = pd.to_datetime(queries_df['at'])
+    queries_df['MB'] = queries_df['bytes'] / (1024 * 1024)
+
+    col1, col2 = st.columns(2)
+    for col, value, unit in ((col1, 'seconds', "seconds"), (col2, 'MB', "MB fetched")):
+        with col:
+            fig, ax = plt.subplots(figsize=(6, 4))
+            for label, group in queries_df.groupby('label'):
+                ax.plot(group['at'], group[value], marker='o', label=label)
+            ax.set_ylabel(unit)
+            ax.legend()
+            ax.tick_params(axis='x', rotation=45)
+            st.pyplot(fig, clear_figure=True)
+
+    st.dataframe(queries_df.iloc[::-1][['at', 'label', 'seconds', 'rows', 'MB']], hide_index=True)
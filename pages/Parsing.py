@@ -1,295 +1,26 @@
+import os
+import warnings
 import streamlit as st
 import pandas as pd
-import numpy as np
 from datetime import datetime, timedelta
-from meteostat import Stations,  Hourly
-import logging
-import os
-import time
-import warnings
-from dotenv import load_dotenv
-import pymysql
-
-# 환경변수 로드
-load_dotenv()
-
-# AWS RDS DB 연결 정보 (환경변수)
-DB_HOST = os.getenv("DB_HOST")
-DB_USER = os.getenv("DB_USER")
-DB_PASSWORD = os.getenv("DB_PASSWORD")
-DB_NAME = os.getenv("DB_NAME")
+from weather.db import get_pool, bootstrap_db, PAST_TABLE_NAME, FUTURE_TABLE_NAME
+from weather.hourly_store import HourlyStore
+from weather.jobs import enqueue_ingest, load_jobs, load_job_workers, JOB_PROGRESS_INTERVAL
+from weather.retry import retry_failed_stations, list_failure_reports
+from weather.ingest import (
+    setup_logging, ingest_past, ingest_future, reaggregate as reaggregate_store, select_stations,
+    FETCH_MAX_WORKERS, FETCH_TIMEOUT, FETCH_RATE_LIMIT, STREAM_CHUNK_SIZE, AGGREGATE_PROCESSES, FAILED_COLUMNS,
+)
 
 warnings.filterwarnings("ignore", category=DeprecationWarning)
 
-# 로그 디렉토리 설정
-if not os.path.exists("logs"):
-    os.makedirs("logs")
+# 로그 파일 설정
+setup_logging()
 
-log_time = datetime.now().strftime("%Y%m%d_%H%M%S")
-log_file = f"logs/weather_parsing_{log_time}.log"
-
-logging.basicConfig(
-    filename=log_file,
-    level=logging.INFO,
-    format="%(asctime)s [%(levelname)s] %(message)s"
-)
-
-# DB 연결 함수
-def get_db_connection():
-    return pymysql.connect(
-        host=DB_HOST,
-        user=DB_USER,
-        password=DB_PASSWORD,
-        database=DB_NAME,
-        charset="utf8mb4",
-        cursorclass=pymysql.cursors.DictCursor
-    )
-
-# DB 데이터 초기화 함수
-def initialize_db(conn, table_name):
-    try:
-        with conn.cursor() as cur:
-            cur.execute(f"""
-            CREATE TABLE IF NOT EXISTS {table_name} (
-                Station_ID TEXT,
-                Station_Name TEXT,
-                Country TEXT,
-                Region TEXT,
-                WMO TEXT,
-                ICAO TEXT,
-                Latitude REAL,
-                Longitude REAL,
-                Elevation REAL,
-                Timezone TEXT,
-                Date DATE,  -- 날짜 형식을 DATE로 수정
-                tavg REAL,
-                tmin REAL,
-                tmax REAL,
-                prcp REAL,
-                snow REAL,
-                avg_wdir REAL,
-                wspd REAL,
-                pres REAL,
-                tsun REAL,
-                avg_rhum REAL,
-                avg_dwpt REAL,            
-                PRIMARY KEY (Station_ID, Date)
-            )
-            """)
-        conn.commit()  # 변경 사항을 커밋
-    except pymysql.MySQLError as e:
-        logging.warning(
-            f"Error initializing table `{table_name}`: {e}")
-
-
-# DB 데이터 조회 함수 (날짜 필터 추가)
-def fetch_from_db_with_date(conn, table_name, start_date=None, end_date=None):
-    data = {'datetime_column': [start_date, end_date]}
-    df_date = pd.DataFrame(data)
-
-    # datetime64[ns] 데이터로 변환
-    df_date['datetime_column'] = pd.to_datetime(df_date['datetime_column'])
-
-    # .dt.date로 날짜 정보만 추출
-    df_date['date_column'] = df_date['datetime_column'].dt.date
-
-    start_date = df_date['date_column'][0]
-    end_date = df_date['date_column'][1]
-
-    with conn:
-        query = f"SELECT * FROM {table_name}"
-        if start_date and end_date:
-            query += f" WHERE DATE(Date) BETWEEN '{start_date}' AND '{end_date}'"
-        elif start_date:
-            query += f" WHERE DATE(Date) >= '{start_date}'"
-        elif end_date:
-            query += f" WHERE DATE(Date) <= '{end_date}'"
-        return pd.read_sql(query, conn)
-
-
-# 과거 데이터 삽입 (중복 데이터 무시)
-def insert_past_data(conn, table_name, data):
-    inserted_count = 0
-
-    if 'Station ID' in data:
-        data.rename(columns={'Station ID': 'Station_ID'}, inplace=True)
-    if 'Station Name' in data:
-        data.rename(columns={'Station Name': 'Station_Name'}, inplace=True)
-
-    with conn.cursor() as cur:
-        for _, row in data.iterrows():
-            try:
-                row_dict = row.to_dict()
-
-                query = f"""
-                    INSERT INTO {table_name} (
-                        Station_ID, Station_Name, Country, Region, WMO, ICAO, Latitude, Longitude, Elevation,
-                        Timezone, Date, tavg, tmin, tmax, prcp, snow, avg_wdir, wspd, pres, tsun, avg_rhum, avg_dwpt
-                    )
-                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-                    ON DUPLICATE KEY UPDATE
-                        tavg=VALUES(tavg),
-                        tmin=VALUES(tmin),
-                        tmax=VALUES(tmax),
-                        prcp=VALUES(prcp),
-                        snow=VALUES(snow),
-                        avg_wdir=VALUES(avg_wdir),
-                        wspd=VALUES(wspd),
-                        pres=VALUES(pres),
-                        tsun=VALUES(tsun),
-                        avg_rhum=VALUES(avg_rhum),
-                        avg_dwpt=VALUES(avg_dwpt);
-                """
-
-                cur.execute(query, (
-                    row_dict.get('Station_ID'), row_dict.get('Station_Name'), row_dict.get('Country'),
-                    row_dict.get('Region'), row_dict.get('WMO'), row_dict.get('ICAO'),
-                    row_dict.get('Latitude'), row_dict.get('Longitude'), row_dict.get('Elevation'),
-                    row_dict.get('Timezone'), row_dict.get('Date'), row_dict.get('tavg'),
-                    row_dict.get('tmin'), row_dict.get('tmax'), row_dict.get('prcp'),
-                    row_dict.get('snow'), row_dict.get('avg_wdir'), row_dict.get('wspd'),
-                    row_dict.get('pres'), row_dict.get('tsun'), row_dict.get('avg_rhum'), row_dict.get('avg_dwpt')
-                ))
-
-                inserted_count += 1
-
-            except Exception as e:
-                logging.warning(
-                    f"Failed to insert past data for Station {row_dict.get('Station_ID')} at {row_dict.get('Time')}: {e}")
-
-    conn.commit()
-    return inserted_count
-
-# 미래 데이터 삽입 또는 업데이트
-def upsert_future_data(conn, table_name, data):
-    inserted_count = 0
-    updated_count = 0
-
-    if 'Station ID' in data:
-        data.rename(columns={'Station ID': 'Station_ID'}, inplace=True)
-    if 'Station Name' in data:
-        data.rename(columns={'Station Name': 'Station_Name'}, inplace=True)
-
-    with conn.cursor() as cur:
-        for _, row in data.iterrows():
-            try:
-                query = f"""
-                    INSERT INTO {table_name} (
-                        Station_ID, Station_Name, Country, Region, WMO, ICAO, Latitude, Longitude, Elevation,
-                        Timezone, Date, tavg, tmin, tmax, prcp, snow, avg_wdir, wspd, pres, tsun, avg_rhum, avg_dwpt
-                    )
-                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-                    ON DUPLICATE KEY UPDATE
-                        tavg=VALUES(tavg),
-                        tmin=VALUES(tmin),
-                        tmax=VALUES(tmax),
-                        prcp=VALUES(prcp),
-                        snow=VALUES(snow),
-                        avg_wdir=VALUES(avg_wdir),
-                        wspd=VALUES(wspd),
-                        pres=VALUES(pres),
-                        tsun=VALUES(tsun),
-                        avg_rhum=VALUES(avg_rhum),
-                        avg_dwpt=VALUES(avg_dwpt);
-                """
-                cur.execute(query, (
-                    row['Station_ID'], row['Station_Name'], row['Country'], row['Region'], row['WMO'], row['ICAO'],
-                    row['Latitude'], row['Longitude'], row['Elevation'], row['Timezone'], row['Date'], row['tavg'],
-                    row['tmin'], row['tmax'], row['prcp'], row['snow'], row['avg_wdir'], row['wspd'],
-                    row['pres'], row['tsun'], row['avg_rhum'], row['avg_dwpt']
-                ))
-                if cur.rowcount == 1:  # 새로 삽입된 경우
-                    inserted_count += 1
-                else:  # 업데이트된 경우
-                    updated_count += 1
-            except Exception as e:
-                logging.warning(f"Failed to upsert future data for Station {row['Station_ID']} at {row['Date']}: {e}")
-
-    conn.commit()
-    return inserted_count, updated_count
-
-
-# 데이터 삽입 함수
-def insert_data_from_csv(conn, table_name, data):
-    inserted_count = 0
-    updated_count = 0
-
-    with conn.cursor() as cur:
-        for _, row in data.iterrows():
-            try:
-                query = f"""
-                    INSERT INTO {table_name} (
-                        Station_ID, Station_Name, Country, Region, WMO, ICAO, Latitude, Longitude, Elevation,
-                        Timezone, Date, tavg, tmin, tmax, prcp, snow, avg_wdir, wspd, pres, tsun, avg_rhum, avg_dwpt
-                    )
-                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-                    ON DUPLICATE KEY UPDATE
-                        tavg=VALUES(tavg),
-                        tmin=VALUES(tmin),
-                        tmax=VALUES(tmax),
-                        prcp=VALUES(prcp),
-                        snow=VALUES(snow),
-                        avg_wdir=VALUES(avg_wdir),
-                        wspd=VALUES(wspd),
-                        pres=VALUES(pres),
-                        tsun=VALUES(tsun),
-                        avg_rhum=VALUES(avg_rhum),
-                        avg_dwpt=VALUES(avg_dwpt);
-                """
-                cur.execute(query, tuple(row[col] for col in [
-                    'Station_ID', 'Station_Name', 'Country', 'Region', 'WMO', 'ICAO',
-                    'Latitude', 'Longitude', 'Elevation', 'Timezone', 'Date', 'tavg',
-                    'tmin', 'tmax', 'prcp', 'snow', 'avg_wdir', 'wspd',
-                    'pres', 'tsun', 'avg_rhum', 'avg_dwpt'
-                ]))
-                if cur.rowcount == 1:
-                    inserted_count += 1
-                else:
-                    updated_count += 1
-            except Exception as e:
-                logging.warning(f"Failed to process data for Station {row['Station_ID']} at {row['Date']}: {e}")
-
-    conn.commit()
-    return inserted_count, updated_count
-
-
-
-# 날짜별 평균 바람 방향 계산 함수
-def calculate_wind_direction(df):
-    # 날짜 열 추가
-    df['Date'] = df['Time'].dt.date
-
-    # 라디안으로 변환
-    df['WindDirection_rad'] = np.deg2rad(df['wdir'])
-
-    # X, Y 성분 계산
-    df['x'] = np.cos(df['WindDirection_rad'])
-    df['y'] = np.sin(df['WindDirection_rad'])
-
-    # X, Y 성분 평균
-    avg_x = df['x'].mean()
-    avg_y = df['y'].mean()
-
-    # 평균 방향 계산 (라디안)
-    avg_direction_rad = np.arctan2(avg_y, avg_x)
-
-    # 라디안을 도(degree)로 변환하고 0~360도로 조정
-    avg_direction_deg = np.degrees(avg_direction_rad)
-    if avg_direction_deg < 0:
-        avg_direction_deg += 360
-
-    return avg_direction_deg
-
-# 데이터 파싱 함수
-def parse_weather_data(start_date, end_date):
-    stations = Stations().region('US').fetch()
-    all_weather_data = pd.DataFrame()
-    failed_stations = []
 
+# 진행 상황 표시 (ingest 모듈의 progress 콜백)
+def make_progress_display(start_date, end_date):
     progress_bar = st.progress(0)  # 프로그레스 바 초기화
-    total_stations = len(stations)
-    success_count = 0
-    failure_count = 0
 
     # 텍스트 출력 영역 초기화
     metrics_placeholder = st.empty()
@@ -297,118 +28,71 @@ def parse_weather_data(start_date, end_date):
     # 기간 출력
     st.write(f"**Parsing period:** {start_date.strftime('%Y-%m-%d')} to {end_date.strftime('%Y-%m-%d')}")
 
-    start_time = time.time()  # 파싱 시작 시간 기록
-
-    for index, station in enumerate(stations.itertuples(), start=1):
-        try:
-            station_id = station.Index
-            data = Hourly(station_id, start_date, end_date).fetch()
-            # print(station_id, data)
-
-            if not data.empty:
-                # 메타데이터 추가
-                data['Station ID'] = station_id
-                data['Station Name'] = station.name
-                data['Country'] = station.country
-                data['Region'] = station.region
-                data['WMO'] = station.wmo
-                data['ICAO'] = station.icao
-                data['Latitude'] = station.latitude
-                data['Longitude'] = station.longitude
-                data['Elevation'] = station.elevation
-                data['Timezone'] = station.timezone
-                data['Time'] = data.index
-
-                # 날짜만 추출하여 'Date' 열 생성
-                data['Date'] = data['Time'].dt.date
-
-                # Daily 데이터로 집계
-                daily_data = data.groupby(['Station ID', 'Date']).agg({
-                    'temp': ['mean', 'min', 'max'],  # 평균, 최저, 최고 온도
-                    'prcp': 'sum',  # 강수량 합계
-                    'snow': 'sum',  # 적설량 합계
-                    # 'wdir': 'mean',  # 평균 풍향
-                    'wspd': 'mean',  # 평균 풍속
-                    'pres': 'mean',  # 평균 기압
-                    'tsun': 'sum',  # 일조 시간 합계
-                    'rhum': 'mean',  # 평균 상대습도
-                    'dwpt': 'mean'   # 평균 이슬점
-                }).reset_index()
-
-                # 열 이름 정리
-                daily_data.columns = ['Station ID', 'Date', 'tavg', 'tmin', 'tmax', 'prcp', 'snow',
-                                      'wspd', 'pres', 'tsun', 'avg_rhum', 'avg_dwpt']
-
-                wind_directions = data.groupby(['Station ID', 'Date']).apply(calculate_wind_direction).reset_index(name='avg_wdir')
-                daily_data = pd.merge(daily_data, wind_directions, on=['Station ID', 'Date'])
-
-                # 메타데이터 추가
-                meta_columns = ['Station Name', 'Country', 'Region', 'WMO', 'ICAO', 'Latitude', 'Longitude', 'Elevation', 'Timezone']
-
-                # 메타데이터 열을 고유값으로 채워서 daily_data에 추가
-                for col in meta_columns:
-                    # 'Station ID'와 'Date'를 기준으로 고유값을 가져와 병합
-                    metadata = data[['Station ID', col]].drop_duplicates()
-                    daily_data = pd.merge(daily_data, metadata, on='Station ID', how='left')
-
-                if 'Station ID' in daily_data:
-                    daily_data.rename(columns={'Station ID': 'Station_ID'}, inplace=True)
-                if 'Station Name' in daily_data:
-                    daily_data.rename(columns={'Station Name': 'Station_Name'}, inplace=True)
-
-                # 열 순서 정렬
-                daily_data = daily_data[[
-                    'Station_ID', 'Station_Name', 'Country', 'Region', 'WMO', 'ICAO', 'Latitude', 'Longitude', 'Elevation',
-                    'Timezone', 'Date', 'tavg', 'tmin', 'tmax', 'prcp', 'snow', 'avg_wdir', 'wspd', 'pres', 'tsun', 'avg_rhum', 'avg_dwpt'
-                ]]
-
-                # 데이터 추가
-                all_weather_data = pd.concat([all_weather_data, daily_data])
-                success_count += 1
-            else:
-                raise ValueError("No data fetched")
-        except Exception as e:
-            # 파싱 실패 시 기록
-            failed_stations.append((station_id, station.name, str(e)))
-            failure_count += 1
-            logging.warning(f"Failed to parse station {station.name} (ID: {station_id}): {e}")
-
-        # 진행 상황 업데이트
-        progress_bar.progress(index / total_stations)
-        elapsed_time = time.time() - start_time
-        remaining_time = (elapsed_time / index) * (total_stations - index)
-        completion_time = datetime.now() + timedelta(seconds=remaining_time)
+    def show_progress(snapshot):
+        progress_bar.progress(snapshot['processed'] / snapshot['total'])
+        remaining_time = snapshot['remaining_seconds']
 
         # 텍스트 영역 업데이트
         metrics_placeholder.markdown(f"""
-        **Stations Processed**: {index}/{total_stations}  
-        **Success Count**: {success_count}  
-        **Failure Count**: {failure_count}  
+        **Stations Processed**: {snapshot['processed']}/{snapshot['total']}  
+        **Success Count**: {snapshot['success_count']}  
+        **Failure Count**: {snapshot['failure_count']}  
         **Time Remaining**: {int(remaining_time // 60)}m {int(remaining_time % 60)}s  
-        **Estimated Completion**: {completion_time.strftime("%H:%M:%S")}
+        **Estimated Completion**: {snapshot['completion_time'].strftime("%H:%M:%S")}
         """)
 
-    # 실패 스테이션 로그 저장
+    return show_progress
+
+
+# 수집 결과 출력
+def show_ingest_result(message, result):
+    st.write(f"**Stations fetched:** {result['stations_to_fetch']}")
+    st.success(f"{message} Inserted rows: {result['inserted_count']}, Updated rows: {result['updated_count']}, "
+               f"Unchanged rows: {result['unchanged_count']}")
+
+    failed_stations = result['failed_stations']
     if failed_stations:
-        failed_df = pd.DataFrame(failed_stations, columns=['Station ID', 'Station Name', 'Error'])
-        failed_csv = f"logs/failed_stations_{log_time}.csv"
-        failed_df.to_csv(failed_csv, index=False)
-        st.warning(f"Failed station details saved to `{failed_csv}`")
+        st.warning(f"{len(failed_stations)} stations failed to parse. Details saved to {result['failed_csv']}")
+        failed_df = pd.DataFrame(failed_stations, columns=FAILED_COLUMNS)
+        st.write(failed_df)
+
+
+# 작업 큐 진행 상황 (모든 워커 합계)
+def show_job_progress():
+    with get_pool().connection() as db_conn:
+        jobs = load_jobs(db_conn, limit=5)
+        running = [job for job in jobs if job['status'] == 'running']
+        workers = load_job_workers(db_conn, running[0]['job_id']) if running else []
+    if not jobs:
+        st.info("No jobs queued yet. Queue one from the sidebar and start `python -m weather.cli worker` processes.")
+        return
+
+    for job in running:
+        finished = job['done'] + job['failed']
+        st.write(f"**Job {job['job_id']}** ({job['table_name']}, "
+                 f"{job['start_date']:%Y-%m-%d} to {job['end_date']:%Y-%m-%d}): "
+                 f"{finished}/{job['station_count']} stations, {job['claimed']} in progress, "
+                 f"{job['failed']} failed, {job['workers']} workers, {job['rows_written']} rows")
+        st.progress(finished / job['station_count'] if job['station_count'] else 1.0)
+    if workers:
+        st.dataframe(pd.DataFrame(workers), hide_index=True)
+    st.dataframe(pd.DataFrame(jobs), hide_index=True)
 
-    return all_weather_data, failed_stations
+
+# 작업 진행 상황 자동 새로고침 (JOB_PROGRESS_INTERVAL초마다 이 부분만 다시 그림)
+@st.fragment(run_every=JOB_PROGRESS_INTERVAL)
+def watch_job_progress():
+    show_job_progress()
 
 
 # Streamlit App
 st.title("Weather Data Parsing")
 
-# DB 초기화
-past_table_name = "past_weather"
-future_table_name = "future_weather"
-
-db_conn = get_db_connection()
+# DB 초기화 (프로세스당 한 번)
+past_table_name = PAST_TABLE_NAME
+future_table_name = FUTURE_TABLE_NAME
 
-initialize_db(db_conn, past_table_name)
-initialize_db(db_conn, future_table_name)
+bootstrap_db()
 
 # 데이터 파싱
 st.sidebar.title("Weather Data Parsing")
@@ -430,26 +114,121 @@ past_end_date_time = datetime.combine(past_end_date, datetime.min.time())
 future_end_date = st.sidebar.date_input("Future End Date", datetime.now().date() + timedelta(days=7))
 future_end_date_time = datetime.combine(future_end_date, datetime.min.time())
 
+st.sidebar.title("Fetch Settings")
+fetch_workers = st.sidebar.number_input("Concurrent Stations", min_value=1, max_value=64, value=FETCH_MAX_WORKERS)
+fetch_timeout = st.sidebar.number_input("Station Timeout (s)", min_value=1.0, value=FETCH_TIMEOUT)
+fetch_rate_limit = st.sidebar.number_input("Requests per Second (0 = unlimited)", min_value=0.0, value=FETCH_RATE_LIMIT)
+
+st.sidebar.title("Station Subset")
+station_subset = st.sidebar.radio("Stations", ("All US Stations", "Bounding Box", "Near a Point"))
+selected_stations = None
+if station_subset == "Bounding Box":
+    bbox_min_lat, bbox_max_lat = st.sidebar.slider("Latitude", -90.0, 90.0, (24.0, 50.0))
+    bbox_min_lon, bbox_max_lon = st.sidebar.slider("Longitude", -180.0, 180.0, (-125.0, -66.0))
+    selected_stations = select_stations(bbox=(bbox_min_lat, bbox_min_lon, bbox_max_lat, bbox_max_lon))
+elif station_subset == "Near a Point":
+    near_lat = st.sidebar.number_input("Latitude", min_value=-90.0, max_value=90.0, value=40.71)
+    near_lon = st.sidebar.number_input("Longitude", min_value=-180.0, max_value=180.0, value=-74.01)
+    near_radius = st.sidebar.number_input("Radius (km)", min_value=1.0, value=100.0)
+    selected_stations = select_stations(near=(near_lat, near_lon), radius_km=near_radius)
+if selected_stations is not None:
+    st.sidebar.caption(f"{len(selected_stations)} stations selected")
+
+st.sidebar.title("Write Settings")
+write_mode = st.sidebar.radio("Write Mode", ("Batched Upsert", "Bulk Load (Backfill)"))
+stream_chunk_size = st.sidebar.number_input("Stations per Write Chunk", min_value=1, value=STREAM_CHUNK_SIZE)
+aggregate_processes = st.sidebar.number_input(
+    "Aggregation Processes (0 = in-thread)", min_value=0, max_value=64, value=AGGREGATE_PROCESSES)
+incremental = st.sidebar.checkbox("Incremental (skip data already ingested)", value=True)
+
+st.sidebar.title("Local Hourly Store")
+keep_raw_hourly = st.sidebar.checkbox("Save raw hourly data locally", value=True)
+reaggregate_target = st.sidebar.radio("Re-aggregate into", ("Past Weather", "Future Weather"))
+reaggregate = st.sidebar.button("Re-aggregate from Local Store")
+
+st.sidebar.title("Retry Failed Stations")
+failure_reports = list_failure_reports()
+retry_report = st.sidebar.selectbox("Failure Report", failure_reports, format_func=os.path.basename)
+retry_target = st.sidebar.radio("Retry into", ("Past Weather", "Future Weather"))
+retry_failed = st.sidebar.button("Retry Failed Stations", disabled=not failure_reports)
+
+st.sidebar.title("Distributed Ingest")
+queue_target = st.sidebar.radio("Queue into", ("Past Weather", "Future Weather"))
+queue_job = st.sidebar.button("Queue Job for Workers")
+hourly_store = HourlyStore()
+
 if parse_past:
     st.info("Parsing past week's weather data...")
-    with st.spinner("Processing past weather data..."):
-        past_weather_data, failed_stations = parse_weather_data(past_start_date_time, past_end_date_time)
-        inserted_count = insert_past_data(db_conn, past_table_name, past_weather_data)
-    st.success(f"Past week's weather data parsed. Inserted rows: {inserted_count}")
-
-    if failed_stations:
-        st.warning(f"{len(failed_stations)} stations failed to parse:")
-        failed_df = pd.DataFrame(failed_stations, columns=['Station ID', 'Station Name', 'Error'])
-        st.write(failed_df)
+    with st.spinner("Processing past weather data..."), get_pool().connection() as db_conn:
+        result = ingest_past(
+            db_conn, past_start_date_time, past_end_date_time, past_table_name,
+            bulk_load=write_mode == "Bulk Load (Backfill)", incremental=incremental,
+            hourly_store=hourly_store if keep_raw_hourly else None,
+            max_workers=fetch_workers, timeout=fetch_timeout, rate_limit=fetch_rate_limit,
+            chunk_size=stream_chunk_size, processes=aggregate_processes, stations=selected_stations,
+            progress=make_progress_display(past_start_date_time, past_end_date_time))
+    show_ingest_result("Past week's weather data parsed.", result)
 
 if parse_future:
     st.info("Parsing next week's weather forecast data...")
-    with st.spinner("Processing future weather data..."):
-        future_weather_data, failed_stations = parse_weather_data(past_end_date_time, future_end_date_time)
-        inserted_count, updated_count = upsert_future_data(db_conn, future_table_name, future_weather_data)
-    st.success(f"Future week's weather data parsed. Inserted rows: {inserted_count}, Updated rows: {updated_count}")
-
-    if failed_stations:
-        st.warning(f"{len(failed_stations)} stations failed to parse:")
-        failed_df = pd.DataFrame(failed_stations, columns=['Station ID', 'Station Name', 'Error'])
-        st.write(failed_df)
+    with st.spinner("Processing future weather data..."), get_pool().connection() as db_conn:
+        result = ingest_future(
+            db_conn, past_end_date_time, future_end_date_time, future_table_name,
+            bulk_load=write_mode == "Bulk Load (Backfill)", incremental=incremental,
+            hourly_store=hourly_store if keep_raw_hourly else None,
+            max_workers=fetch_workers, timeout=fetch_timeout, rate_limit=fetch_rate_limit,
+            chunk_size=stream_chunk_size, processes=aggregate_processes, stations=selected_stations,
+            progress=make_progress_display(past_end_date_time, future_end_date_time))
+    show_ingest_result("Future week's weather data parsed.", result)
+
+if reaggregate:
+    # 로컬 저장소의 원본 Hourly 데이터로 Daily 데이터를 다시 계산 (meteostat 요청 없음)
+    if reaggregate_target == "Past Weather":
+        target_table, start_time, end_time = past_table_name, past_start_date_time, past_end_date_time
+    else:
+        target_table, start_time, end_time = future_table_name, past_end_date_time, future_end_date_time
+    st.info(f"Re-aggregating `{target_table}` from the local hourly store...")
+    with st.spinner("Re-aggregating hourly data..."), get_pool().connection() as db_conn:
+        result = reaggregate_store(
+            db_conn, target_table, start_time, end_time, hourly_store,
+            bulk_load=write_mode == "Bulk Load (Backfill)", chunk_size=stream_chunk_size,
+            processes=aggregate_processes)
+    st.success(f"Re-aggregation finished. Inserted rows: {result['inserted_count']}, "
+               f"Updated rows: {result['updated_count']}, Unchanged rows: {result['unchanged_count']}")
+
+if retry_failed:
+    # 실패 리포트의 스테이션만 다시 수집 (빈 데이터 스테이션 제외, 일시 오류는 백오프 후 재시도)
+    if retry_target == "Past Weather":
+        target_table, start_time, end_time = past_table_name, past_start_date_time, past_end_date_time
+    else:
+        target_table, start_time, end_time = future_table_name, past_end_date_time, future_end_date_time
+    st.info(f"Retrying failed stations from `{os.path.basename(retry_report)}` into `{target_table}`...")
+    with st.spinner("Retrying failed stations..."), get_pool().connection() as db_conn:
+        result = retry_failed_stations(
+            db_conn, retry_report, target_table, start_time, end_time,
+            bulk_load=write_mode == "Bulk Load (Backfill)", incremental=incremental,
+            hourly_store=hourly_store if keep_raw_hourly else None,
+            max_workers=fetch_workers, timeout=fetch_timeout, rate_limit=fetch_rate_limit,
+            chunk_size=stream_chunk_size, processes=aggregate_processes,
+            progress=make_progress_display(start_time, end_time))
+    show_ingest_result("Retry of failed stations finished.", result)
+
+if queue_job:
+    # 스테이션 목록을 작업 큐에 등록 (수집은 `python -m weather.cli worker` 프로세스가 나눠서 처리)
+    if queue_target == "Past Weather":
+        target_table, start_time, end_time = past_table_name, past_start_date_time, past_end_date_time
+    else:
+        target_table, start_time, end_time = future_table_name, past_end_date_time, future_end_date_time
+    with st.spinner("Queueing stations..."), get_pool().connection() as db_conn:
+        job_id = enqueue_ingest(
+            db_conn, target_table, start_time, end_time, incremental=incremental, stations=selected_stations)
+    st.success(f"Queued job {job_id} for `{target_table}`.")
+    st.session_state['watch_jobs'] = True  # 방금 등록한 작업은 자동으로 지켜봄
+
+st.subheader("Worker Jobs")
+# 켜져 있을 때만 주기적으로 DB를 조회 (꺼져 있으면 페이지를 다시 그릴 때 한 번만 조회)
+if st.toggle("Auto-refresh", key='watch_jobs',
+             help=f"Reload job progress every {JOB_PROGRESS_INTERVAL:g} seconds. Turned on when a job is queued."):
+    watch_job_progress()
+else:
+    show_job_progress()
@@ -0,0 +1,143 @@
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+from weather.metrics import timed
+
+# 집계 프로세스 수 (0이면 파이프라인 스레드에서 직접 집계)
+AGGREGATE_PROCESSES = int(os.getenv("AGGREGATE_PROCESSES", "0"))
+
+# Daily 테이블 열 순서 (스테이션 메타데이터는 stations 테이블에 저장)
+DAILY_COLUMNS = [
+    'Station_ID', 'Date', 'tavg', 'tmin', 'tmax', 'prcp', 'snow', 'avg_wdir', 'wspd', 'pres', 'tsun', 'avg_rhum', 'avg_dwpt'
+]
+
+# 하루에 집계된 Hourly 행 수 (DB에 기록하지 않음, 과거 워터마크에서 하루 전체가 들어왔는지 판단)
+HOUR_COUNT_COLUMN = 'hour_count'
+AGGREGATE_COLUMNS = DAILY_COLUMNS + [HOUR_COUNT_COLUMN]
+
+# 집계에 사용하는 Hourly 열
+HOURLY_COLUMNS = ['temp', 'prcp', 'snow', 'wdir', 'wspd', 'pres', 'tsun', 'rhum', 'dwpt']
+
+
+# 여러 스테이션의 Hourly 데이터를 하나로 합침 (Station_ID 열 추가, 인덱스는 시각)
+def concat_hourly(hourly_frames):
+    """hourly_frames: (station_id, Hourly DataFrame) 목록. 데이터가 없으면 None"""
+    frames = [(station_id, data) for station_id, data in hourly_frames if not data.empty]
+    if not frames:
+        return None
+
+    hourly = pd.concat([data.reindex(columns=HOURLY_COLUMNS) for _, data in frames])
+    hourly['Station_ID'] = np.repeat([station_id for station_id, _ in frames], [len(data) for _, data in frames])
+    return hourly
+
+
+# 합친 Hourly 데이터를 Daily 데이터로 집계
+def aggregate_hourly(hourly):
+    hourly['Date'] = hourly.index.normalize()
+
+    # 풍향은 원형 평균: X, Y 성분 평균 후 arctan2
+    wdir_rad = np.deg2rad(hourly['wdir'].to_numpy())
+    hourly['x'] = np.cos(wdir_rad)
+    hourly['y'] = np.sin(wdir_rad)
+
+    # 스테이션 입력 순서를 유지하도록 sort=False
+    daily_data = hourly.groupby(['Station_ID', 'Date'], sort=False).agg(
+        tavg=('temp', 'mean'),  # 평균 온도
+        tmin=('temp', 'min'),  # 최저 온도
+        tmax=('temp', 'max'),  # 최고 온도
+        prcp=('prcp', 'sum'),  # 강수량 합계
+        snow=('snow', 'sum'),  # 적설량 합계
+        wspd=('wspd', 'mean'),  # 평균 풍속
+        pres=('pres', 'mean'),  # 평균 기압
+        tsun=('tsun', 'sum'),  # 일조 시간 합계
+        avg_rhum=('rhum', 'mean'),  # 평균 상대습도
+        avg_dwpt=('dwpt', 'mean'),  # 평균 이슬점
+        x=('x', 'mean'),
+        y=('y', 'mean'),
+        hour_count=('temp', 'size'),
+    ).reset_index()
+
+    # 라디안을 도(degree)로 변환하고 0~360도로 조정
+    avg_wdir = np.degrees(np.arctan2(daily_data['y'].to_numpy(), daily_data['x'].to_numpy()))
+    daily_data['avg_wdir'] = np.where(avg_wdir < 0, avg_wdir + 360, avg_wdir)
+    daily_data['Date'] = daily_data['Date'].dt.date
+
+    return daily_data[AGGREGATE_COLUMNS]
+
+
+# 여러 스테이션의 Hourly 데이터를 한 번에 Daily 데이터로 집계
+def aggregate_daily(hourly_frames):
+    """hourly_frames: (station_id, Hourly DataFrame) 목록"""
+    hourly = concat_hourly(hourly_frames)
+    if hourly is None:
+        return pd.DataFrame(columns=AGGREGATE_COLUMNS)
+    return aggregate_hourly(hourly)
+
+
+# DataFrame <-> Arrow IPC 스트림 (프로세스 간 전달은 DataFrame pickle 대신 연속된 버퍼 하나로)
+def frame_to_ipc(data, preserve_index=False):
+    table = pa.Table.from_pandas(data, preserve_index=preserve_index)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def frame_from_ipc(buffer):
+    return pa.ipc.open_stream(buffer).read_all().to_pandas()
+
+
+# 워커 프로세스에서 실행: Arrow로 받은 Hourly 데이터를 집계해 Arrow로 돌려줌 (집계 소요 시간 포함)
+def aggregate_ipc(buffer):
+    start = time.perf_counter()
+    result = frame_to_ipc(aggregate_hourly(frame_from_ipc(buffer)))
+    return result, time.perf_counter() - start
+
+
+# 집계 단계를 프로세스 풀로 분산 (GIL 우회)
+class AggregatePool:
+    """submit()은 Daily DataFrame(프로세스 0개) 또는 Arrow IPC 결과를 돌려줄 Future를 반환.
+    Future는 제출 순서대로 기다리면 결과 순서가 입력 순서와 같음"""
+
+    def __init__(self, processes=AGGREGATE_PROCESSES, metrics=None):
+        self.processes = max(0, processes)
+        self.metrics = metrics
+        self.executor = None
+        if self.processes:
+            # 수집/기록 스레드가 도는 중에 fork하지 않도록 spawn 사용
+            self.executor = ProcessPoolExecutor(
+                max_workers=self.processes, mp_context=multiprocessing.get_context("spawn"))
+
+    # metrics: 풀을 여러 실행이 나눠 쓸 때 이번 실행의 지표 (없으면 생성할 때 받은 지표)
+    def submit(self, hourly_frames, metrics=None):
+        hourly = concat_hourly(hourly_frames)
+        if hourly is None:
+            return pd.DataFrame(columns=AGGREGATE_COLUMNS)
+        if self.executor is None:
+            with timed(metrics or self.metrics, 'aggregate_seconds'):
+                return aggregate_hourly(hourly)
+        return self.executor.submit(aggregate_ipc, frame_to_ipc(hourly, preserve_index=True))
+
+    def close(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait=True, cancel_futures=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+# 집계 결과 받기 (Future면 완료까지 대기 후 Arrow 결과 변환)
+def resolve_chunk(chunk, metrics=None):
+    if isinstance(chunk, pd.DataFrame):
+        return chunk
+    buffer, seconds = chunk.result()
+    if metrics is not None:
+        metrics.observe('aggregate_seconds', seconds)
+    return frame_from_ipc(buffer)
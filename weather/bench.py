@@ -0,0 +1,452 @@
+# 수집 -> 집계 -> 업서트 -> 조회 파이프라인 오프라인 벤치마크 (meteostat, RDS 없이 실행)
+#
+#   python -m weather.bench --stations 500 --days 30
+#   python -m weather.bench --stations 200 --days 7 --missing-rate 0.2 --processes 4 --json logs/bench.json
+#   python -m weather.bench --db mysql   # .env의 서버 (로컬 MariaDB 권장, 별도 벤치마크 DB를 만들고 끝나면 삭제)
+import argparse
+import json
+import logging
+import os
+import re
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+from functools import partial
+from types import SimpleNamespace
+import numpy as np
+import pandas as pd
+import pymysql
+from pymysql.constants import FIELD_TYPE
+from pymysql.converters import escape_item
+
+from weather import ingest
+from weather.aggregate import AGGREGATE_PROCESSES, DAILY_COLUMNS
+from weather.catalog import StationCatalog
+from weather.db import get_db_connection, prepare_db, read_frame, DB_NAME, PAST_TABLE_NAME, FUTURE_TABLE_NAME
+
+# meteostat Hourly 열
+SYNTHETIC_HOURLY_COLUMNS = ['temp', 'dwpt', 'rhum', 'prcp', 'snow', 'wdir', 'wspd', 'wpgt', 'pres', 'tsun', 'coco']
+
+# 스테이션 카탈로그 조회 단계의 조회 지점 수
+CATALOG_QUERIES = 200
+
+# 단계 중 RSS를 읽는 간격 (초)
+RSS_SAMPLE_INTERVAL = 0.01
+
+# --db mysql용 데이터베이스 (실행마다 새로 만들고 끝나면 삭제, 운영 테이블에는 기록하지 않음)
+BENCH_DB_NAME = os.getenv("BENCH_DB_NAME", f"{DB_NAME or 'weather'}_bench")
+
+
+# 합성 스테이션 목록 (meteostat Stations().fetch()와 같은 형태)
+def make_stations(station_count, seed=0):
+    rng = np.random.default_rng(seed)
+    station_ids = [f"B{i:05d}" for i in range(station_count)]
+    return pd.DataFrame({
+        'name': [f"Bench Station {i}" for i in range(station_count)],
+        'country': 'US',
+        'region': rng.choice(['CA', 'NY', 'TX', 'WA', 'FL'], station_count),
+        'wmo': None,
+        'icao': None,
+        'latitude': rng.uniform(25, 49, station_count),
+        'longitude': rng.uniform(-124, -67, station_count),
+        'elevation': rng.uniform(0, 2000, station_count),
+        'timezone': 'America/New_York',
+    }, index=pd.Index(station_ids, name='id'))
+
+
+# 합성 Hourly 데이터 (스테이션마다 같은 시드 -> 실행마다 같은 데이터)
+def make_hourly(station_index, start, end, missing_rate=0.05, seed=0):
+    rng = np.random.default_rng([seed, station_index])
+    index = pd.date_range(start, end, freq='h', name='time')
+    hours = len(index)
+    day_cycle = np.sin(2 * np.pi * (index.hour.to_numpy() - 9) / 24)
+    data = pd.DataFrame({
+        'temp': 15 + 8 * day_cycle + rng.normal(0, 2, hours),
+        'dwpt': 8 + rng.normal(0, 3, hours),
+        'rhum': rng.uniform(20, 100, hours),
+        'prcp': np.where(rng.random(hours) < 0.1, rng.exponential(1.5, hours), 0.0),
+        'snow': 0.0,
+        'wdir': rng.uniform(0, 360, hours),
+        'wspd': rng.gamma(2.0, 5.0, hours),
+        'wpgt': np.nan,
+        'pres': 1013 + rng.normal(0, 6, hours),
+        'tsun': np.where(day_cycle > 0, 60.0, 0.0),
+        'coco': rng.integers(1, 10, hours).astype(float),
+    }, index=index, columns=SYNTHETIC_HOURLY_COLUMNS)
+    if missing_rate > 0:
+        measures = data.columns.drop('coco')
+        mask = rng.random((hours, len(measures))) < missing_rate
+        data[measures] = data[measures].mask(mask)
+    return data
+
+
+# meteostat 대역: 미리 만든 합성 데이터 보관
+class SyntheticSource:
+    def __init__(self, station_count, start, end, missing_rate=0.05, latency=0.0, seed=0):
+        self.stations = make_stations(station_count, seed)
+        self.latency = latency
+        self.frames = {
+            station_id: make_hourly(i, start, end, missing_rate, seed)
+            for i, station_id in enumerate(self.stations.index)
+        }
+
+    @property
+    def hourly_rows(self):
+        return sum(len(data) for data in self.frames.values())
+
+
+# Stations()와 같은 인터페이스
+class SyntheticStations:
+    def __init__(self, source):
+        self.source = source
+
+    def region(self, country, state=None):
+        return self
+
+    def fetch(self):
+        return self.source.stations.copy()
+
+
+# Hourly(id, start, end)와 같은 인터페이스
+class SyntheticHourly:
+    def __init__(self, source, station_id, start, end):
+        self.source = source
+        self.station_id = station_id
+        self.start = start
+        self.end = end
+
+    def fetch(self):
+        if self.source.latency:
+            time.sleep(self.source.latency)  # 네트워크 지연 흉내
+        return self.source.frames[self.station_id].loc[self.start:self.end]
+
+
+# ingest 모듈의 meteostat 참조를 합성 데이터로 잠시 교체
+@contextmanager
+def use_source(source):
+    original = ingest.Stations, ingest.Hourly, ingest.load_station_catalog
+    ingest.Stations = partial(SyntheticStations, source)
+    ingest.Hourly = partial(SyntheticHourly, source)
+    # 로컬 카탈로그 파일 대신 합성 스테이션 목록 사용
+    catalog = StationCatalog(source.stations)
+    ingest.load_station_catalog = lambda refresh=False: catalog
+    try:
+        yield source
+    finally:
+        ingest.Stations, ingest.Hourly, ingest.load_station_catalog = original
+
+
+# 메모리 DB 대역 (pymysql 연결과 같은 인터페이스)
+class MemoryCursor:
+    """날씨 테이블 업서트, 키 존재 확인, SELECT만 흉내냄. 나머지 문(롤업, 워터마크, stations)은 인코딩만 하고 무시.
+    파라미터는 실제 드라이버처럼 SQL 리터럴로 인코딩해 클라이언트 측 비용을 반영"""
+
+    def __init__(self, db):
+        self.db = db
+        self.description = None
+        self.rowcount = 0
+        self._result = None
+        self.rows = []
+
+    def execute(self, query, args=None):
+        literals = [escape_item(value, 'utf8mb4') for value in (args or ())]
+        self.rows = []
+        self.description = None
+        self.rowcount = 0
+        self._result = None
+
+        insert = re.match(r"\s*INSERT INTO (\w+) \(Station_ID, Date,", query)
+        count_keys = re.match(r"\s*SELECT COUNT\(\*\) AS existing_count FROM (\w+)", query)
+        select = re.match(r"\s*SELECT (.+?) FROM (\w+)", query, re.S)
+        if insert and insert.group(1) in self.db.tables:
+            # 서버와 같은 기준: 같은 값으로 덮어쓴 행은 Duplicates/rowcount에 들어가지 않음 (CLIENT.FOUND_ROWS 없음)
+            table = self.db.tables[insert.group(1)]
+            width = len(ingest.WRITE_COLUMNS)
+            inserted = changed = 0
+            for start in range(0, len(args), width):
+                row = tuple(args[start:start + width])
+                stored = table.get((row[0], row[1]))
+                inserted += stored is None
+                changed += stored is not None and stored != row
+                table[(row[0], row[1])] = row
+            records = len(literals) // width
+            self.rowcount = inserted + 2 * changed
+            self._result = SimpleNamespace(message=f"Records: {records}  Duplicates: {changed}  Warnings: 0".encode())
+        elif count_keys and count_keys.group(1) in self.db.tables:
+            table = self.db.tables[count_keys.group(1)]
+            keys = zip(args[0::2], args[1::2])
+            self.rows = [{'existing_count': sum(key in table for key in keys)}]
+            self.rowcount = 1
+        elif select and select.group(2) in self.db.tables:
+            # WHERE 조건은 무시하고 테이블 전체를 반환
+            columns = [col.strip().split('.')[-1] for col in select.group(1).split(',')]
+            positions = [ingest.WRITE_COLUMNS.index(col) for col in columns]
+            self.description = [(col, self.db.field_type(col)) for col in columns]
+            self.rows = [tuple(row[i] for i in positions) for row in self.db.tables[select.group(2)].values()]
+            self.rowcount = len(self.rows)
+        return self.rowcount
+
+    def executemany(self, query, args):
+        for row in args:
+            for value in row:
+                escape_item(value, 'utf8mb4')
+        self.rowcount = len(args)
+        return self.rowcount
+
+    def fetchmany(self, size):
+        rows, self.rows = self.rows[:size], self.rows[size:]
+        return rows
+
+    def fetchall(self):
+        return self.fetchmany(len(self.rows))
+
+    def fetchone(self):
+        rows = self.fetchmany(1)
+        return rows[0] if rows else None
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class MemoryDB:
+    open = True
+
+    def __init__(self):
+        self.tables = {PAST_TABLE_NAME: {}, FUTURE_TABLE_NAME: {}}
+
+    @staticmethod
+    def field_type(column):
+        if column == 'Date':
+            return FIELD_TYPE.DATE
+        if column == 'Station_ID':
+            return FIELD_TYPE.VAR_STRING
+        if column == 'row_hash':
+            return FIELD_TYPE.LONGLONG
+        return FIELD_TYPE.DOUBLE
+
+    def cursor(self, cursor_class=None):
+        return MemoryCursor(self)
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        pass
+
+
+# 단계별 시간, 처리 행 수, 단계 중 최대 RSS와 시작 대비 증가량 기록
+class StageTimer:
+    def __init__(self, sample_interval=RSS_SAMPLE_INTERVAL):
+        self.sample_interval = sample_interval
+        self.stages = []
+
+    @contextmanager
+    def stage(self, name):
+        record = {'stage': name, 'rows': 0}
+        sampler = RssSampler(self.sample_interval)
+        start = time.perf_counter()
+        try:
+            yield record
+        finally:
+            record['seconds'] = time.perf_counter() - start
+            record['peak_rss_mb'], record['rss_growth_mb'] = sampler.stop()
+        record['rows_per_sec'] = record['rows'] / record['seconds'] if record['seconds'] else None
+        self.stages.append(record)
+
+
+# 단계 동안 현재 RSS를 주기적으로 읽어 최댓값 기록 (ru_maxrss는 프로세스 전체의 최댓값이라 단계별로 나뉘지 않음)
+class RssSampler:
+    def __init__(self, interval):
+        self.interval = interval
+        self.start_mb = current_rss_mb()
+        self.peak_mb = self.start_mb
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        if self.start_mb is not None:
+            self.thread.start()
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            self.sample()
+
+    def sample(self):
+        rss = current_rss_mb()
+        if rss is not None and rss > self.peak_mb:
+            self.peak_mb = rss
+
+    # (단계 중 최대 RSS, 시작 대비 증가량) MB, 읽을 수 없으면 (None, None)
+    def stop(self):
+        if self.start_mb is None:
+            return None, None
+        self.stopped.set()
+        self.thread.join()
+        self.sample()
+        return self.peak_mb, self.peak_mb - self.start_mb
+
+
+# 현재 프로세스 RSS (MB, /proc가 없는 플랫폼은 None, 집계 프로세스 풀의 자식 프로세스는 포함하지 않음)
+def current_rss_mb():
+    try:
+        with open("/proc/self/statm") as f:
+            resident_pages = int(f.read().split()[1])
+    except (OSError, ValueError, IndexError):
+        return None
+    return resident_pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+
+
+# 벤치마크 전용 데이터베이스를 새로 만들고 스키마 준비 (이전 실행이 남긴 것은 지움)
+def open_bench_db(name=BENCH_DB_NAME):
+    if name == DB_NAME:
+        raise ValueError(f"BENCH_DB_NAME must differ from DB_NAME ({DB_NAME}), the benchmark drops it")
+    conn = get_db_connection(database=None)
+    with conn.cursor() as cur:
+        cur.execute(f"DROP DATABASE IF EXISTS `{name}`")
+        cur.execute(f"CREATE DATABASE `{name}`")
+    conn.select_db(name)
+    prepare_db(conn)
+    return conn
+
+
+def drop_bench_db(conn, name=BENCH_DB_NAME):
+    with conn.cursor() as cur:
+        cur.execute(f"DROP DATABASE IF EXISTS `{name}`")
+
+
+def run_benchmark(station_count=200, days=7, missing_rate=0.05, latency=0.0, db="memory",
+                  max_workers=ingest.FETCH_MAX_WORKERS, processes=AGGREGATE_PROCESSES, seed=0):
+    end_date = datetime.combine(date(2024, 1, 1) + timedelta(days=days), datetime.min.time())
+    start_date = end_date - timedelta(days=days)
+    timer = StageTimer()
+
+    with timer.stage("generate") as record:
+        source = SyntheticSource(station_count, start_date, end_date, missing_rate, latency, seed)
+        record['rows'] = source.hourly_rows
+
+    if db == "memory":
+        conn = MemoryDB()
+    else:
+        conn = open_bench_db()
+
+    try:
+        with use_source(source):
+            with timer.stage("parse (fetch + aggregate)") as record:
+                daily, failed_stations = ingest.parse_weather_data(
+                    start_date, end_date, max_workers, rate_limit=0, processes=processes)
+                record['rows'] = source.hourly_rows
+
+            with timer.stage("upsert stations") as record:
+                ingest.upsert_stations(conn, source.stations)
+                record['rows'] = len(source.stations)
+
+        with timer.stage("station catalog lookups") as record:
+            # 인덱스 생성 + 최근접/영역/이름 조회 (rows = 조회 수)
+            catalog = StationCatalog(source.stations)
+            rng = np.random.default_rng(seed)
+            points = zip(rng.uniform(25, 49, CATALOG_QUERIES), rng.uniform(-124, -67, CATALOG_QUERIES))
+            for lat, lon in points:
+                catalog.nearest(lat, lon, 5)
+                catalog.in_bbox(lat - 1, lon - 1, lat + 1, lon + 1)
+                catalog.search_name("bench station 1", limit=20)
+            record['rows'] = 3 * CATALOG_QUERIES
+
+        with timer.stage("insert_past_data") as record:
+            record['rows'] = len(daily)
+            ingest.insert_past_data(conn, PAST_TABLE_NAME, daily)
+
+        with timer.stage("upsert_future_data") as record:
+            record['rows'] = len(daily)
+            ingest.upsert_future_data(conn, FUTURE_TABLE_NAME, daily)
+
+        with timer.stage("re-upsert (all duplicates)") as record:
+            record['rows'] = len(daily)
+            ingest.upsert_future_data(conn, FUTURE_TABLE_NAME, daily)
+
+        with timer.stage("re-write (unchanged skipped)") as record:
+            # 파이프라인 쓰기 단계와 같은 경로: 내용 해시가 같은 행은 기록하지 않음
+            record['rows'] = len(daily)
+            ingest.make_chunk_writer(conn, FUTURE_TABLE_NAME)(daily)
+
+        with timer.stage("DB_Check fetch") as record:
+            # DB_Check 페이지와 같은 열 선택 + 날짜 범위 조회
+            query = f"SELECT {', '.join(f'w.{col}' for col in DAILY_COLUMNS)} FROM {PAST_TABLE_NAME} w " \
+                    f"WHERE w.Date >= %s AND w.Date <= %s"
+            fetched = read_frame(conn, query, [start_date.date(), end_date.date()])
+            record['rows'] = len(fetched)
+    finally:
+        try:
+            if db != "memory":
+                drop_bench_db(conn)
+        finally:
+            conn.close()
+
+    return {
+        'stations': station_count,
+        'days': days,
+        'missing_rate': missing_rate,
+        'db': db,
+        'max_workers': max_workers,
+        'processes': processes,
+        'failed_stations': len(failed_stations),
+        'stages': timer.stages,
+    }
+
+
+def format_report(report):
+    lines = [
+        f"stations={report['stations']} days={report['days']} missing_rate={report['missing_rate']} "
+        f"db={report['db']} workers={report['max_workers']} processes={report['processes']}",
+        f"{'stage':<28}{'rows':>10}{'seconds':>10}{'rows/sec':>12}{'peak RSS MB':>14}{'RSS +MB':>10}",
+    ]
+    for stage in report['stages']:
+        rate = f"{stage['rows_per_sec']:.0f}" if stage['rows_per_sec'] else "-"
+        rss = f"{stage['peak_rss_mb']:.1f}" if stage['peak_rss_mb'] is not None else "-"
+        growth = f"{stage['rss_growth_mb']:.1f}" if stage['rss_growth_mb'] is not None else "-"
+        lines.append(
+            f"{stage['stage']:<28}{stage['rows']:>10}{stage['seconds']:>10.3f}{rate:>12}{rss:>14}{growth:>10}")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m weather.bench", description="Offline ingest pipeline benchmark")
+    parser.add_argument("--stations", type=int, default=200)
+    parser.add_argument("--days", type=int, default=7)
+    parser.add_argument("--missing-rate", type=float, default=0.05, help="fraction of hourly values set to NaN")
+    parser.add_argument("--latency", type=float, default=0.0, help="simulated seconds per station request")
+    parser.add_argument("--db", choices=("memory", "mysql"), default="memory",
+                        help="in-process stand-in, or a scratch database (BENCH_DB_NAME) on the server in .env")
+    parser.add_argument("--workers", type=int, default=ingest.FETCH_MAX_WORKERS)
+    parser.add_argument("--processes", type=int, default=AGGREGATE_PROCESSES)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="also write the report to this JSON file")
+    args = parser.parse_args(argv)
+
+    # 벤치마크 출력에 섞이지 않도록 로그는 경고 이상만
+    logging.basicConfig(level=logging.WARNING)
+
+    try:
+        report = run_benchmark(args.stations, args.days, args.missing_rate, args.latency, args.db,
+                               args.workers, args.processes, args.seed)
+    except pymysql.MySQLError as e:
+        print(f"Database error: {e}", file=sys.stderr)
+        return 1
+
+    print(format_report(report))
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,68 @@
+import functools
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+
+# 조회 결과 캐시 설정
+QUERY_CACHE_TTL = float(os.getenv("QUERY_CACHE_TTL", "600"))  # 캐시 유효 시간 (초)
+QUERY_CACHE_MAX_ENTRIES = int(os.getenv("QUERY_CACHE_MAX_ENTRIES", "32"))  # 최대 항목 수
+QUERY_CACHE_MAX_MB = float(os.getenv("QUERY_CACHE_MAX_MB", "512"))  # 최대 메모리 사용량 (MB)
+
+
+# datetime/Timestamp는 날짜만 비교
+def to_date(value):
+    if isinstance(value, datetime):
+        return value.date()
+    return value
+
+
+# (테이블, 시작일, 종료일, 변형 키) 단위 조회 결과 캐시 (TTL + 크기 제한 LRU + 테이블 데이터 버전)
+class QueryCache:
+    def __init__(self, ttl=QUERY_CACHE_TTL, max_entries=QUERY_CACHE_MAX_ENTRIES, max_bytes=QUERY_CACHE_MAX_MB * 1024 ** 2):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()  # key -> (DataFrame, 데이터 버전, 저장 시각, 바이트 수)
+        self.total_bytes = 0
+        self.lock = threading.Lock()
+
+    # variant: 같은 기간 안에서 결과를 구분하는 추가 키 (필터, 열 목록 등)
+    # version: DB의 테이블 데이터 버전 (저장 후 다른 프로세스가 기록했으면 캐시 미스)
+    def get(self, table_name, start_date=None, end_date=None, variant=None, version=None):
+        key = (table_name, to_date(start_date), to_date(end_date), variant)
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            data, stored_version, stored_at, _ = entry
+            if stored_version != version or time.monotonic() - stored_at > self.ttl:
+                self.remove(key)
+                return None
+            self.entries.move_to_end(key)
+            return data
+
+    def put(self, table_name, start_date, end_date, data, variant=None, version=None):
+        key = (table_name, to_date(start_date), to_date(end_date), variant)
+        size = int(data.memory_usage(index=True, deep=False).sum())
+        if size > self.max_bytes:
+            return
+        with self.lock:
+            if key in self.entries:
+                self.remove(key)
+            self.entries[key] = (data, version, time.monotonic(), size)
+            self.total_bytes += size
+            # 오래 사용되지 않은 항목부터 제거
+            while len(self.entries) > self.max_entries or self.total_bytes > self.max_bytes:
+                self.remove(next(iter(self.entries)))
+
+    def remove(self, key):
+        _, _, _, size = self.entries.pop(key)
+        self.total_bytes -= size
+
+
+# 프로세스 전체에서 공유하는 조회 결과 캐시
+@functools.lru_cache(maxsize=None)
+def get_query_cache():
+    return QueryCache()
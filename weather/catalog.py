@@ -0,0 +1,153 @@
+import bisect
+import logging
+import os
+import re
+import threading
+import time
+import numpy as np
+import pandas as pd
+
+# 로컬 스테이션 카탈로그 설정
+STATION_CATALOG_PATH = os.getenv("STATION_CATALOG_PATH", "data/stations.parquet")
+STATION_CATALOG_TTL_HOURS = float(os.getenv("STATION_CATALOG_TTL_HOURS", "24"))  # 지나면 meteostat에서 다시 받음
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE_LAT = np.pi * EARTH_RADIUS_KM / 180
+
+
+# 한 점에서 여러 점까지의 대원 거리 (km)
+def haversine_km(lat, lon, lats, lons):
+    lat, lon, lats, lons = np.radians(lat), np.radians(lon), np.radians(lats), np.radians(lons)
+    a = np.sin((lats - lat) / 2) ** 2 + np.cos(lat) * np.cos(lats) * np.sin((lons - lon) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+# 이름을 검색용 단어로 분리 (소문자, 영숫자만)
+def name_tokens(name):
+    return [token for token in re.split(r"[^0-9a-z]+", str(name).lower()) if token]
+
+
+# 스테이션 목록 + 위경도 인덱스 + 이름 단어 접두어 인덱스
+class StationCatalog:
+    """stations: meteostat Stations().fetch() 형태 (인덱스 id, name/region/latitude/longitude 열).
+    위치는 위도로 정렬해 두고 위도 띠 안의 후보만 거리 계산, 이름은 단어별로 정렬해 두고 접두어 이진 탐색"""
+
+    def __init__(self, stations):
+        self.stations = stations
+        located = np.flatnonzero(stations['latitude'].notna().to_numpy() & stations['longitude'].notna().to_numpy())
+        lats = stations['latitude'].to_numpy(dtype=np.float64)[located]
+        order = np.argsort(lats, kind='stable')
+        self.lat_positions = located[order]  # 위도 순서의 행 위치
+        self.lats = lats[order]
+        self.lons = stations['longitude'].to_numpy(dtype=np.float64)[self.lat_positions]
+
+        # 이름 순위 (검색 결과를 정렬 없이 이름 순으로 반환)
+        names = stations['name'].astype(object).fillna("").astype(str).str.lower().to_numpy()
+        self.name_order = np.argsort(names, kind='stable')
+        names = names[self.name_order]
+        words = sorted((token, rank) for rank, name in enumerate(names) for token in set(name_tokens(name)))
+        self.words = [word for word, _ in words]
+        self.word_ranks = np.array([rank for _, rank in words], dtype=np.int64)
+
+    def __len__(self):
+        return len(self.stations)
+
+    # 위도 [low, high] 띠에 있는 스테이션 (위도 순서 배열의 구간)
+    def lat_band(self, low, high):
+        return np.searchsorted(self.lats, low, side='left'), np.searchsorted(self.lats, high, side='right')
+
+    # 사각 영역 안의 스테이션
+    def in_bbox(self, min_lat, min_lon, max_lat, max_lon):
+        start, end = self.lat_band(min_lat, max_lat)
+        lons = self.lons[start:end]
+        mask = (lons >= min_lon) & (lons <= max_lon)
+        return self.stations.iloc[np.sort(self.lat_positions[start:end][mask])]
+
+    # 반경 radius_km 안의 (행 위치, 거리) 배열 (가까운 순)
+    def radius_hits(self, lat, lon, radius_km):
+        delta = radius_km / KM_PER_DEGREE_LAT
+        start, end = self.lat_band(lat - delta, lat + delta)
+        distances = haversine_km(lat, lon, self.lats[start:end], self.lons[start:end])
+        inside = np.flatnonzero(distances <= radius_km)
+        inside = inside[np.argsort(distances[inside], kind='stable')]
+        return self.lat_positions[start:end][inside], distances[inside]
+
+    # 반경 radius_km 안의 스테이션 (가까운 순, distance_km 열 추가)
+    def within_radius(self, lat, lon, radius_km):
+        positions, distances = self.radius_hits(lat, lon, radius_km)
+        return self.stations.iloc[positions].assign(distance_km=distances)
+
+    # 가장 가까운 k개 (반경을 두 배씩 넓혀 가며 찾음)
+    def nearest(self, lat, lon, k=10, radius_km=50.0):
+        k = min(k, len(self.lats))
+        while True:
+            positions, distances = self.radius_hits(lat, lon, radius_km)
+            if len(positions) >= k or radius_km >= np.pi * EARTH_RADIUS_KM:
+                return self.stations.iloc[positions[:k]].assign(distance_km=distances[:k])
+            radius_km *= 2
+
+    # 단어 접두어가 prefix인 스테이션의 이름 순위 (정렬, 중복 없음)
+    def prefix_ranks(self, prefix):
+        start = bisect.bisect_left(self.words, prefix)
+        end = bisect.bisect_left(self.words, prefix + "\uffff")
+        return np.unique(self.word_ranks[start:end])
+
+    # 이름 검색: 모든 검색어가 이름의 어떤 단어의 접두어인 스테이션 (이름 순)
+    def search_name(self, query, limit=None):
+        query_tokens = name_tokens(query)
+        if not query_tokens:
+            return self.stations.iloc[:0]
+        ranks = self.prefix_ranks(query_tokens[0])
+        for token in query_tokens[1:]:
+            ranks = np.intersect1d(ranks, self.prefix_ranks(token), assume_unique=True)
+        return self.stations.iloc[self.name_order[ranks[:limit]]]
+
+    # 영역/반경 조건으로 스테이션 부분 집합 선택 (조건이 없으면 전체)
+    def select(self, bbox=None, near=None, radius_km=None):
+        stations = self.stations
+        if bbox is not None:
+            stations = self.in_bbox(*bbox)
+        if near is not None:
+            nearby = self.within_radius(near[0], near[1], radius_km)
+            stations = stations.loc[nearby.index.intersection(stations.index, sort=False)]
+        return stations
+
+
+# 로컬 Parquet 파일에 저장해 두는 스테이션 카탈로그 (프로세스 안에서는 메모리에 유지)
+class StationCatalogCache:
+    def __init__(self, path=STATION_CATALOG_PATH, ttl_hours=STATION_CATALOG_TTL_HOURS):
+        self.path = path
+        self.ttl = ttl_hours * 3600
+        self.lock = threading.Lock()
+        self.catalog = None
+        self.loaded_at = None
+
+    def is_fresh(self):
+        return os.path.exists(self.path) and time.time() - os.path.getmtime(self.path) <= self.ttl
+
+    # 카탈로그 반환 (파일이 TTL보다 오래됐거나 refresh=True면 fetch_stations()로 다시 받아 저장)
+    def get(self, fetch_stations, refresh=False):
+        with self.lock:
+            if not refresh and self.catalog is not None and time.time() - self.loaded_at <= self.ttl:
+                return self.catalog
+            if refresh or not self.is_fresh():
+                try:
+                    self.save(fetch_stations())
+                except Exception as e:
+                    # 받지 못하면 오래된 파일이라도 사용
+                    if not os.path.exists(self.path):
+                        raise
+                    logging.warning(f"Failed to refresh station catalog, using cached copy: {e}")
+            self.catalog = StationCatalog(pd.read_parquet(self.path))
+            self.loaded_at = time.time()
+            return self.catalog
+
+    def save(self, stations):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        stations.to_parquet(tmp_path)
+        os.replace(tmp_path, self.path)
+        logging.info(f"Station catalog refreshed: {len(stations)} stations")
+
+
+STATION_CATALOG = StationCatalogCache()
@@ -0,0 +1,276 @@
+# Streamlit 없이 수집/재집계를 실행하는 배치 CLI (cron, 스케줄러용)
+#
+#   python -m weather.cli past --start 2024-01-01 --end 2024-01-08
+#   python -m weather.cli future --days 7 --progress json
+#   python -m weather.cli reaggregate --table past_weather --start 2024-01-01 --end 2024-01-08
+#   python -m weather.cli retry --start 2024-01-01 --end 2024-01-08
+#   python -m weather.cli enqueue --table past_weather --start 2024-01-01 --end 2024-01-08
+#   python -m weather.cli worker   (여러 호스트/프로세스에서 동시에 실행)
+#   python -m weather.cli past --near 40.71,-74.01 --radius 150
+#   python -m weather.cli stations --name "los angeles"
+import argparse
+import json
+import sys
+from datetime import datetime, timedelta
+
+from weather.db import get_db_connection, prepare_db, PAST_TABLE_NAME, FUTURE_TABLE_NAME
+from weather.hourly_store import HourlyStore
+from weather.ingest import (
+    setup_logging, ingest_past, ingest_future, reaggregate,
+    load_station_catalog, select_stations,
+    FETCH_MAX_WORKERS, FETCH_TIMEOUT, FETCH_RATE_LIMIT, STREAM_CHUNK_SIZE, PROGRESS_INTERVAL, AGGREGATE_PROCESSES,
+)
+from weather.jobs import (
+    enqueue_ingest, run_worker, load_jobs, JOB_BATCH_SIZE, JOB_STALE_SECONDS, JOB_MAX_ATTEMPTS, JOB_POLL_INTERVAL,
+)
+from weather.retry import retry_failed_stations, latest_failure_report, RETRY_MAX_ATTEMPTS, RETRY_BASE_DELAY
+
+
+# 날짜 인자 파싱 (YYYY-MM-DD)
+def parse_date(value):
+    try:
+        return datetime.strptime(value, "%Y-%m-%d")
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid date '{value}' (expected YYYY-MM-DD)")
+
+
+# 좌표 인자 파싱 ("LAT,LON" 또는 "MIN_LAT,MIN_LON,MAX_LAT,MAX_LON")
+def parse_coordinates(value, count):
+    try:
+        coordinates = tuple(float(part) for part in value.split(","))
+    except ValueError:
+        coordinates = ()
+    if len(coordinates) != count:
+        raise argparse.ArgumentTypeError(f"invalid coordinates '{value}' (expected {count} comma-separated numbers)")
+    return coordinates
+
+
+def parse_point(value):
+    return parse_coordinates(value, 2)
+
+
+def parse_bbox(value):
+    min_lat, min_lon, max_lat, max_lon = parse_coordinates(value, 4)
+    if min_lat > max_lat or min_lon > max_lon:
+        raise argparse.ArgumentTypeError(f"invalid bbox '{value}' (expected MIN_LAT,MIN_LON,MAX_LAT,MAX_LON)")
+    return min_lat, min_lon, max_lat, max_lon
+
+
+# 진행 상황 출력 (text: 사람이 읽는 한 줄, json: 한 줄에 JSON 하나)
+def make_progress_printer(fmt):
+    if fmt == "none":
+        return None
+
+    def print_progress(snapshot):
+        if fmt == "json":
+            record = dict(snapshot, completion_time=snapshot['completion_time'].isoformat(timespec='seconds'))
+            print(json.dumps(record), file=sys.stderr, flush=True)
+        else:
+            remaining_time = snapshot['remaining_seconds']
+            print(f"[{snapshot['processed']}/{snapshot['total']}] "
+                  f"success={snapshot['success_count']} failure={snapshot['failure_count']} "
+                  f"remaining={int(remaining_time // 60)}m {int(remaining_time % 60)}s",
+                  file=sys.stderr, flush=True)
+
+    return print_progress
+
+
+def build_parser():
+    today = datetime.combine(datetime.now().date(), datetime.min.time())
+
+    parser = argparse.ArgumentParser(prog="python -m weather.cli", description="Headless weather data ingestion")
+    parser.add_argument("--progress", choices=("text", "json", "none"), default="text",
+                        help="progress output on stderr (default: text)")
+    parser.add_argument("--progress-interval", type=float, default=PROGRESS_INTERVAL,
+                        help="minimum seconds between progress updates")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    past = commands.add_parser("past", help="ingest observed data for a past date range")
+    past.add_argument("--start", type=parse_date, default=today - timedelta(days=7))
+    past.add_argument("--end", type=parse_date, default=today)
+    past.add_argument("--table", default=PAST_TABLE_NAME)
+
+    future = commands.add_parser("future", help="ingest forecast data starting today")
+    future.add_argument("--start", type=parse_date, default=today)
+    future.add_argument("--days", type=int, default=7, help="forecast horizon in days")
+    future.add_argument("--table", default=FUTURE_TABLE_NAME)
+
+    retry = commands.add_parser("retry", help="re-fetch only the stations listed in a failure report")
+    retry.add_argument("--report", help="failed_stations_*.csv to retry (default: the latest in logs/)")
+    retry.add_argument("--table", choices=(PAST_TABLE_NAME, FUTURE_TABLE_NAME), default=PAST_TABLE_NAME)
+    retry.add_argument("--start", type=parse_date, default=today - timedelta(days=7))
+    retry.add_argument("--end", type=parse_date, default=today)
+    retry.add_argument("--attempts", type=int, default=RETRY_MAX_ATTEMPTS,
+                       help="retry rounds for transient failures")
+    retry.add_argument("--base-delay", type=float, default=RETRY_BASE_DELAY,
+                       help="backoff base in seconds (doubled every round, with jitter)")
+
+    enqueue = commands.add_parser("enqueue", help="queue all US stations as work items for `worker` processes")
+    enqueue.add_argument("--table", choices=(PAST_TABLE_NAME, FUTURE_TABLE_NAME), default=PAST_TABLE_NAME)
+    enqueue.add_argument("--start", type=parse_date, default=today - timedelta(days=7))
+    enqueue.add_argument("--end", type=parse_date, default=today)
+    enqueue.add_argument("--full", action="store_true", help="ignore watermarks and queue the whole range")
+
+    worker = commands.add_parser("worker", help="claim queued stations in batches and ingest them")
+    worker.add_argument("--worker-id", help="name recorded on claimed items (default: host:pid)")
+    worker.add_argument("--batch-size", type=int, default=JOB_BATCH_SIZE, help="stations claimed at a time")
+    worker.add_argument("--stale-seconds", type=int, default=JOB_STALE_SECONDS,
+                        help="claims older than this are taken over by other workers")
+    worker.add_argument("--max-attempts", type=int, default=JOB_MAX_ATTEMPTS)
+    worker.add_argument("--wait", action="store_true", help="keep polling for new jobs instead of exiting when idle")
+    worker.add_argument("--poll-interval", type=float, default=JOB_POLL_INTERVAL)
+
+    jobs = commands.add_parser("jobs", help="print recent jobs and their progress as JSON lines")
+    jobs.add_argument("--limit", type=int, default=10)
+
+    stations = commands.add_parser("stations", help="look up stations in the local catalog as JSON lines")
+    stations.add_argument("--name", help="station name search (word prefixes, e.g. 'los ang')")
+    stations.add_argument("--nearest", type=int, help="with --near: the N closest stations instead of a radius")
+    stations.add_argument("--limit", type=int, default=50)
+    stations.add_argument("--refresh", action="store_true", help="re-download the catalog from meteostat first")
+
+    for command in (past, future, enqueue, stations):
+        command.add_argument("--bbox", type=parse_bbox, metavar="MIN_LAT,MIN_LON,MAX_LAT,MAX_LON",
+                             help="only stations inside this box")
+        command.add_argument("--near", type=parse_point, metavar="LAT,LON", help="only stations around this point")
+        command.add_argument("--radius", type=float, default=100.0, help="km around --near (default: 100)")
+
+    for command in (past, future, retry, worker):
+        command.add_argument("--workers", type=int, default=FETCH_MAX_WORKERS)
+        command.add_argument("--timeout", type=float, default=FETCH_TIMEOUT)
+        command.add_argument("--rate-limit", type=float, default=FETCH_RATE_LIMIT)
+        command.add_argument("--no-store", action="store_true", help="do not keep raw hourly data locally")
+
+    again = commands.add_parser("reaggregate", help="rebuild daily rows from the local hourly store")
+    again.add_argument("--table", choices=(PAST_TABLE_NAME, FUTURE_TABLE_NAME), default=PAST_TABLE_NAME)
+    again.add_argument("--start", type=parse_date, default=today - timedelta(days=7))
+    again.add_argument("--end", type=parse_date, default=today)
+
+    for command in (past, future, retry):
+        command.add_argument("--full", action="store_true", help="ignore watermarks and fetch the whole range")
+
+    for command in (past, future, retry, worker, again):
+        command.add_argument("--chunk-size", type=int, default=STREAM_CHUNK_SIZE)
+        command.add_argument("--bulk-load", action="store_true", help="use LOAD DATA staging (backfills)")
+        command.add_argument("--processes", type=int, default=AGGREGATE_PROCESSES,
+                             help="aggregation worker processes (0 = aggregate in the pipeline thread)")
+
+    return parser
+
+
+# --bbox/--near로 고른 스테이션 (조건이 없으면 None = 전체 US)
+def station_subset(args):
+    if args.bbox is None and args.near is None:
+        return None
+    return select_stations(args.bbox, args.near, args.radius)
+
+
+# 스테이션 카탈로그 조회
+def run_stations_command(args):
+    catalog = load_station_catalog(refresh=args.refresh)
+    if args.name:
+        found = catalog.search_name(args.name)
+        if args.bbox is not None or args.near is not None:
+            found = found.loc[found.index.isin(catalog.select(args.bbox, args.near, args.radius).index)]
+    elif args.near is not None and args.nearest:
+        found = catalog.nearest(*args.near, k=args.nearest)
+    elif args.near is not None:
+        found = catalog.within_radius(*args.near, args.radius)
+        if args.bbox is not None:
+            found = found.loc[found.index.isin(catalog.in_bbox(*args.bbox).index)]
+    else:
+        found = catalog.select(args.bbox)
+    for station_id, station in found.head(args.limit).iterrows():
+        print(json.dumps(dict(station.dropna(), id=station_id), default=str))
+    return 0
+
+
+# 작업 큐 명령 (enqueue, worker, jobs)
+def run_queue_command(args, progress, log_file):
+    conn = get_db_connection()
+    try:
+        prepare_db(conn)
+        if args.command == "enqueue":
+            job_id = enqueue_ingest(
+                conn, args.table, args.start, args.end, incremental=not args.full, stations=station_subset(args))
+            print(json.dumps({'command': args.command, 'table': args.table, 'job_id': job_id}))
+            return 0
+        if args.command == "jobs":
+            for job in load_jobs(conn, args.limit):
+                print(json.dumps(job, default=str))
+            return 0
+        totals = run_worker(
+            conn, args.worker_id, args.batch_size, args.stale_seconds, args.max_attempts,
+            exit_when_idle=not args.wait, poll_interval=args.poll_interval, bulk_load=args.bulk_load,
+            hourly_store=None if args.no_store else HourlyStore(),
+            max_workers=args.workers, timeout=args.timeout, rate_limit=args.rate_limit,
+            chunk_size=args.chunk_size, processes=args.processes,
+            progress=progress, progress_interval=args.progress_interval)
+    finally:
+        conn.close()
+
+    print(json.dumps(dict(totals, command=args.command, log_file=log_file)))
+    return 1 if totals['failed_count'] else 0
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    log_file = setup_logging()
+
+    progress = make_progress_printer(args.progress)
+    if args.command == "stations":
+        return run_stations_command(args)
+    if args.command in ("enqueue", "worker", "jobs"):
+        return run_queue_command(args, progress, log_file)
+    if args.command == "retry":
+        args.report = args.report or latest_failure_report()
+        if args.report is None:
+            print("No failure report found in logs/", file=sys.stderr)
+            return 2
+    hourly_store = HourlyStore()
+    conn = get_db_connection()
+    try:
+        prepare_db(conn)
+        if args.command == "reaggregate":
+            result = reaggregate(conn, args.table, args.start, args.end, hourly_store,
+                                 args.bulk_load, args.chunk_size, args.processes)
+        elif args.command == "retry":
+            result = retry_failed_stations(
+                conn, args.report, args.table, args.start, args.end,
+                bulk_load=args.bulk_load, incremental=not args.full,
+                hourly_store=None if args.no_store else hourly_store,
+                max_workers=args.workers, timeout=args.timeout, rate_limit=args.rate_limit,
+                chunk_size=args.chunk_size, processes=args.processes,
+                max_attempts=args.attempts, base_delay=args.base_delay,
+                progress=progress, progress_interval=args.progress_interval)
+        else:
+            ingest = ingest_past if args.command == "past" else ingest_future
+            end = args.end if args.command == "past" else args.start + timedelta(days=args.days)
+            result = ingest(
+                conn, args.start, end, args.table,
+                bulk_load=args.bulk_load, incremental=not args.full,
+                hourly_store=None if args.no_store else hourly_store,
+                max_workers=args.workers, timeout=args.timeout, rate_limit=args.rate_limit,
+                chunk_size=args.chunk_size, progress=progress, progress_interval=args.progress_interval,
+                processes=args.processes, stations=station_subset(args))
+    finally:
+        conn.close()
+
+    summary = {
+        'command': args.command,
+        'table': args.table,
+        'stations_to_fetch': result['stations_to_fetch'],
+        'inserted_count': result['inserted_count'],
+        'updated_count': result['updated_count'],
+        'unchanged_count': result['unchanged_count'],
+        'failed_count': len(result['failed_stations']),
+        'failed_csv': result['failed_csv'],
+        'log_file': log_file,
+    }
+    print(json.dumps(summary))
+    # 실패한 스테이션이 있으면 종료 코드 1 (스케줄러에서 재시도 판단용)
+    return 1 if result['failed_stations'] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
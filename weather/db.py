@@ -0,0 +1,212 @@
+import functools
+import pandas as pd
+import pyarrow as pa
+import pymysql
+from pymysql.constants import FIELD_TYPE
+import logging
+import os
+import queue
+import threading
+import time
+from contextlib import contextmanager
+from dotenv import load_dotenv
+from weather.schema import (
+    run_migrations, ensure_month_partitions, DB_PARTITION_BY_MONTH, WEATHER_TABLES, DATA_VERSIONS_TABLE,
+)
+from weather.metrics import QUERY_METRICS
+
+# 환경변수 로드
+load_dotenv()
+
+# AWS RDS DB 연결 정보 (환경변수)
+DB_HOST = os.getenv("DB_HOST")
+DB_USER = os.getenv("DB_USER")
+DB_PASSWORD = os.getenv("DB_PASSWORD")
+DB_NAME = os.getenv("DB_NAME")
+
+# 커넥션 풀 설정
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))  # 프로세스당 최대 연결 수
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))  # 빈 연결을 기다리는 최대 시간 (초)
+DB_POOL_MAX_IDLE = float(os.getenv("DB_POOL_MAX_IDLE", "300"))  # 이 시간 이상 쉰 연결은 재사용 전 확인 (초)
+
+# 조회 결과를 나눠 받는 행 수 (서버 측 커서)
+FETCH_CHUNK_ROWS = int(os.getenv("FETCH_CHUNK_ROWS", "20000"))
+
+# 조회 결과 열 형식: 반복되는 스테이션 문자열은 category, 측정값은 float32 (좌표는 정밀도 유지)
+CATEGORY_COLUMNS = ('Station_ID', 'Station_Name', 'Country', 'Region', 'Timezone')
+FLOAT64_COLUMNS = ('Latitude', 'Longitude', 'Elevation')
+FLOAT_FIELD_TYPES = (FIELD_TYPE.DOUBLE, FIELD_TYPE.FLOAT, FIELD_TYPE.DECIMAL, FIELD_TYPE.NEWDECIMAL)
+DECIMAL_FIELD_TYPES = (FIELD_TYPE.DECIMAL, FIELD_TYPE.NEWDECIMAL)  # 드라이버가 Decimal로 돌려주므로 float로 변환
+INTEGER_FIELD_TYPES = (FIELD_TYPE.TINY, FIELD_TYPE.SHORT, FIELD_TYPE.LONG, FIELD_TYPE.LONGLONG, FIELD_TYPE.INT24)
+
+# 테이블 이름
+PAST_TABLE_NAME, FUTURE_TABLE_NAME = WEATHER_TABLES
+
+
+# DB 연결 함수 (database=None이면 데이터베이스를 선택하지 않고 연결)
+def get_db_connection(database=DB_NAME):
+    return pymysql.connect(
+        host=DB_HOST,
+        user=DB_USER,
+        password=DB_PASSWORD,
+        database=database,
+        charset="utf8mb4",
+        cursorclass=pymysql.cursors.DictCursor,
+        local_infile=True  # 대량 적재 모드 (LOAD DATA LOCAL INFILE)
+    )
+
+
+# 크기가 제한된 스레드 안전 커넥션 풀
+class ConnectionPool:
+    def __init__(self, max_size=DB_POOL_SIZE, timeout=DB_POOL_TIMEOUT, max_idle=DB_POOL_MAX_IDLE):
+        self.timeout = timeout
+        self.max_idle = max_idle
+        self.idle = queue.LifoQueue()  # (연결, 마지막 사용 시각)
+        self.slots = threading.BoundedSemaphore(max_size)
+
+    # 유휴 연결 재사용 (오래 쉰 연결은 ping으로 확인, 끊겼으면 재연결)
+    def checkout(self):
+        while True:
+            try:
+                conn, last_used = self.idle.get_nowait()
+            except queue.Empty:
+                return get_db_connection()
+            if time.monotonic() - last_used < self.max_idle and conn.open:
+                return conn
+            try:
+                conn.ping(reconnect=True)
+                return conn
+            except pymysql.MySQLError as e:
+                logging.warning(f"Discarding stale DB connection: {e}")
+                self.discard(conn)
+
+    def discard(self, conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    @contextmanager
+    def connection(self):
+        if not self.slots.acquire(timeout=self.timeout):
+            raise TimeoutError(f"No DB connection available within {self.timeout}s")
+        conn = None
+        try:
+            conn = self.checkout()
+            yield conn
+        except (pymysql.err.OperationalError, pymysql.err.InterfaceError):
+            # 연결 자체에 문제가 생긴 경우 풀에 돌려놓지 않음
+            if conn is not None:
+                self.discard(conn)
+                conn = None
+            raise
+        finally:
+            if conn is not None:
+                try:
+                    conn.rollback()  # 커밋되지 않은 상태는 다음 사용자에게 넘기지 않음
+                    self.idle.put((conn, time.monotonic()))
+                except pymysql.MySQLError:
+                    self.discard(conn)
+            self.slots.release()
+
+
+# 프로세스 전체에서 공유하는 커넥션 풀 (모든 세션/재실행에서 재사용)
+@functools.lru_cache(maxsize=None)
+def get_pool():
+    return ConnectionPool()
+
+
+# 인덱스를 사용할 수 있는 날짜 범위 조건 (Date 열을 함수로 감싸지 않음)
+def date_range_condition(start_date=None, end_date=None, column="Date"):
+    conditions = []
+    params = []
+    if start_date:
+        conditions.append(f"{column} >= %s")
+        params.append(start_date)
+    if end_date:
+        conditions.append(f"{column} <= %s")
+        params.append(end_date)
+    return conditions, params
+
+
+# 테이블 데이터 버전 (한 번도 기록되지 않았으면 0)
+def load_data_version(conn, table_name):
+    with conn.cursor() as cur:
+        cur.execute(f"SELECT version FROM {DATA_VERSIONS_TABLE} WHERE table_name = %s", (table_name,))
+        row = cur.fetchone()
+    return row['version'] if row else 0
+
+
+# 기록 후 데이터 버전 증가 (CLI/워커 등 다른 프로세스의 조회 캐시도 다음 조회에서 무효화됨)
+def bump_data_version(conn, table_name):
+    with conn.cursor() as cur:
+        cur.execute(f"""
+        INSERT INTO {DATA_VERSIONS_TABLE} (table_name, version) VALUES (%s, 1)
+        ON DUPLICATE KEY UPDATE version = version + 1
+        """, (table_name,))
+    conn.commit()
+
+
+# DB 열 형식 -> Arrow 형식
+def arrow_type(name, field_type):
+    if field_type in FLOAT_FIELD_TYPES:
+        return pa.float64() if name in FLOAT64_COLUMNS else pa.float32()
+    if field_type in INTEGER_FIELD_TYPES:
+        return pa.int64()
+    if field_type == FIELD_TYPE.DATE:
+        return pa.date32()
+    if field_type in (FIELD_TYPE.DATETIME, FIELD_TYPE.TIMESTAMP):
+        return pa.timestamp('us')
+    return pa.string()
+
+
+# Arrow -> pandas 변환 시 문자열/날짜는 Arrow 기반 열로 유지 (category, float는 기본 변환)
+def pandas_type(arrow_dtype):
+    if pa.types.is_string(arrow_dtype) or pa.types.is_date(arrow_dtype):
+        return pd.ArrowDtype(arrow_dtype)
+    return None
+
+
+# 서버 측 커서(SSCursor)로 결과를 청크 단위로 받아 열 단위 Arrow 버퍼로 바로 변환
+def read_frame(conn, query, params=None, chunk_rows=FETCH_CHUNK_ROWS, label=None):
+    """label이 있으면 조회 시간/행 수/바이트 수를 조회 지표로 기록"""
+    start = time.perf_counter()
+    batches = []
+    with conn.cursor(pymysql.cursors.SSCursor) as cursor:
+        cursor.execute(query, params)
+        names = [column[0] for column in cursor.description]
+        schema = pa.schema([(column[0], arrow_type(column[0], column[1])) for column in cursor.description])
+        decimals = [column[1] in DECIMAL_FIELD_TYPES for column in cursor.description]
+        while True:
+            rows = cursor.fetchmany(chunk_rows)
+            if not rows:
+                break
+            columns = [[None if value is None else float(value) for value in values] if is_decimal else values
+                       for values, is_decimal in zip(zip(*rows), decimals)]
+            arrays = [pa.array(values, type=field.type) for values, field in zip(columns, schema)]
+            batches.append(pa.RecordBatch.from_arrays(arrays, schema=schema))
+
+    table = pa.Table.from_batches(batches, schema=schema)
+    for name in names:
+        if name in CATEGORY_COLUMNS and pa.types.is_string(table.schema.field(name).type):
+            index = table.schema.get_field_index(name)
+            table = table.set_column(index, name, table.column(name).dictionary_encode())
+    if label is not None:
+        QUERY_METRICS.record(label, time.perf_counter() - start, table.num_rows, table.nbytes)
+    return table.to_pandas(types_mapper=pandas_type)
+
+
+# 스키마 마이그레이션과 월별 파티션 준비 (Streamlit 밖에서도 사용)
+def prepare_db(conn):
+    run_migrations(conn)
+    if DB_PARTITION_BY_MONTH:
+        for table_name in WEATHER_TABLES:
+            ensure_month_partitions(conn, table_name)
+
+
+# 스키마 마이그레이션은 프로세스당 한 번만 실행 (실패하면 기억하지 않으므로 다음 호출에서 다시 시도)
+@functools.lru_cache(maxsize=None)
+def bootstrap_db():
+    with get_pool().connection() as conn:
+        prepare_db(conn)
+    return True
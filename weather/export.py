@@ -0,0 +1,82 @@
+import gzip
+import hashlib
+import os
+import tempfile
+import threading
+import time
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+# 내보내기 파일 설정
+EXPORT_DIR = os.getenv("EXPORT_DIR", os.path.join(tempfile.gettempdir(), "weather_exports"))
+EXPORT_CHUNK_ROWS = int(os.getenv("EXPORT_CHUNK_ROWS", "100000"))  # 한 번에 변환하는 행 수
+EXPORT_TTL = float(os.getenv("EXPORT_TTL", os.getenv("QUERY_CACHE_TTL", "600")))  # 같은 조회 조건이면 재사용 (초)
+
+# 형식 이름 -> (확장자, MIME 형식)
+EXPORT_FORMATS = {
+    "CSV (gzip)": ("csv.gz", "application/gzip"),
+    "Parquet": ("parquet", "application/vnd.apache.parquet"),
+    "CSV": ("csv", "text/csv"),
+}
+
+
+# 조회 조건, 데이터 버전, 형식별 내보내기 파일 경로
+def export_path(key, export_format, version=None):
+    extension, _ = EXPORT_FORMATS[export_format]
+    digest = hashlib.sha1(repr((key, version, export_format)).encode()).hexdigest()[:16]
+    return os.path.join(EXPORT_DIR, f"{digest}.{extension}")
+
+
+# CSV를 청크 단위로 기록 (전체 문자열을 만들지 않음)
+def write_csv(data, f, chunk_rows=EXPORT_CHUNK_ROWS):
+    for start in range(0, max(len(data), 1), chunk_rows):
+        data.iloc[start:start + chunk_rows].to_csv(f, header=start == 0, index=False)
+
+
+# Parquet을 청크마다 row group 하나로 기록 (스키마는 첫 청크 기준)
+def write_parquet(data, path, chunk_rows=EXPORT_CHUNK_ROWS):
+    writer = None
+    try:
+        for start in range(0, max(len(data), 1), chunk_rows):
+            chunk = pa.Table.from_pandas(
+                data.iloc[start:start + chunk_rows], schema=writer.schema if writer else None, preserve_index=False)
+            if writer is None:
+                writer = pq.ParquetWriter(path, chunk.schema, compression='zstd')
+            writer.write_table(chunk)
+    finally:
+        if writer is not None:
+            writer.close()
+
+
+# 오래된 내보내기 파일 정리
+def evict_exports(ttl=EXPORT_TTL):
+    now = time.time()
+    for name in os.listdir(EXPORT_DIR):
+        path = os.path.join(EXPORT_DIR, name)
+        try:
+            if now - os.path.getmtime(path) > ttl:
+                os.remove(path)
+        except OSError:
+            pass  # 다른 세션이 이미 지웠거나 쓰는 중
+
+
+# 조회 결과를 파일로 내보내고 경로 반환 (같은 조건/데이터 버전/형식의 최근 파일이 있으면 재사용)
+def export_frame(data, key, export_format, version=None, chunk_rows=EXPORT_CHUNK_ROWS, ttl=EXPORT_TTL):
+    os.makedirs(EXPORT_DIR, exist_ok=True)
+    path = export_path(key, export_format, version)
+    if os.path.exists(path) and time.time() - os.path.getmtime(path) <= ttl:
+        return path
+
+    evict_exports(ttl)
+    # 다른 세션이 반쯤 쓴 파일을 받지 않도록 임시 파일에 쓰고 교체
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    if export_format == "Parquet":
+        write_parquet(data, tmp_path, chunk_rows)
+    elif export_format == "CSV (gzip)":
+        with gzip.open(tmp_path, "wt", encoding="utf-8", newline="", compresslevel=6) as f:
+            write_csv(data, f, chunk_rows)
+    else:
+        with open(tmp_path, "w", encoding="utf-8", newline="") as f:
+            write_csv(data, f, chunk_rows)
+    os.replace(tmp_path, path)
+    return path
@@ -0,0 +1,86 @@
+import logging
+import os
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+# 원본 Hourly 데이터 로컬 저장소 설정
+HOURLY_STORE_DIR = os.getenv("HOURLY_STORE_DIR", "data/hourly")
+HOURLY_STORE_MAX_MB = float(os.getenv("HOURLY_STORE_MAX_MB", "2048"))  # 초과 시 오래된 월 파티션부터 삭제
+
+
+# station=<ID>/month=<YYYY-MM>/hourly.parquet 형태로 파티션된 원본 Hourly 데이터 저장소
+class HourlyStore:
+    def __init__(self, root=HOURLY_STORE_DIR, max_bytes=HOURLY_STORE_MAX_MB * 1024 ** 2):
+        self.root = root
+        self.max_bytes = max_bytes
+
+    def partition_path(self, station_id, month):
+        return os.path.join(self.root, f"station={station_id}", f"month={month}", "hourly.parquet")
+
+    # 스테이션 Hourly 데이터를 월별 파티션에 병합 저장 (같은 시각은 새 값으로 교체)
+    def write(self, station_id, data):
+        if data.empty:
+            return
+        for month, month_data in data.groupby(data.index.strftime("%Y-%m")):
+            path = self.partition_path(station_id, month)
+            existing = self.read_partition(path)
+            if existing is not None:
+                month_data = pd.concat([existing, month_data])
+                month_data = month_data[~month_data.index.duplicated(keep='last')].sort_index()
+
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.tmp"
+            pq.write_table(pa.Table.from_pandas(month_data), tmp_path)
+            os.replace(tmp_path, path)  # 읽는 쪽이 쓰다 만 파일을 보지 않도록 교체
+
+    # 메모리 맵으로 파티션 읽기
+    def read_partition(self, path):
+        if not os.path.exists(path):
+            return None
+        with pa.memory_map(path, 'r') as source:
+            return pq.read_table(source).to_pandas()
+
+    def stations(self):
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(
+            name.split("=", 1)[1] for name in os.listdir(self.root) if name.startswith("station=")
+        )
+
+    # 스테이션별 [start, end] 구간의 Hourly 데이터 (station_id, DataFrame) 생성
+    def read(self, start_date, end_date, station_ids=None):
+        months = pd.period_range(start_date, end_date, freq="M").strftime("%Y-%m")
+        for station_id in station_ids if station_ids is not None else self.stations():
+            frames = [self.read_partition(self.partition_path(station_id, month)) for month in months]
+            frames = [frame for frame in frames if frame is not None]
+            if not frames:
+                continue
+            data = pd.concat(frames).sort_index().loc[start_date:end_date]
+            if not data.empty:
+                yield station_id, data
+
+    # 전체 크기가 한도를 넘으면 가장 오래된 월 파티션부터 삭제
+    def evict(self):
+        partitions = []
+        for dirpath, _, filenames in os.walk(self.root):
+            for filename in filenames:
+                if filename == "hourly.parquet":
+                    path = os.path.join(dirpath, filename)
+                    month = os.path.basename(dirpath).split("=", 1)[1]
+                    partitions.append((month, path, os.path.getsize(path)))
+
+        total_bytes = sum(size for _, _, size in partitions)
+        removed = 0
+        for month, path, size in sorted(partitions):
+            if total_bytes <= self.max_bytes:
+                break
+            os.remove(path)
+            for directory in (os.path.dirname(path), os.path.dirname(os.path.dirname(path))):
+                if not os.listdir(directory):
+                    os.rmdir(directory)
+            total_bytes -= size
+            removed += 1
+        if removed:
+            logging.info(f"Evicted {removed} hourly store partitions")
+        return removed
@@ -0,0 +1,831 @@
+import pandas as pd
+from datetime import datetime, timedelta
+from meteostat import Stations, Hourly
+import hashlib
+import logging
+import os
+import queue
+import re
+import tempfile
+import time
+import threading
+import warnings
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from urllib.error import HTTPError
+from dotenv import load_dotenv
+import pymysql
+from weather.aggregate import (
+    AGGREGATE_PROCESSES, DAILY_COLUMNS, AggregatePool, resolve_chunk,
+)
+from weather.db import (
+    bump_data_version, date_range_condition, read_frame, PAST_TABLE_NAME, FUTURE_TABLE_NAME,
+)
+from weather.schema import STATIONS_TABLE
+from weather.catalog import STATION_CATALOG
+from weather.metrics import RunMetrics, timed
+from weather.rollups import refresh_rollups
+from weather.watermarks import (
+    plan_past_fetch, plan_forecast_fetch, update_watermarks, last_complete_date, record_empty_stations,
+)
+
+# 환경변수 로드
+load_dotenv()
+
+# 스테이션 병렬 수집 설정 (환경변수로 조정 가능)
+FETCH_MAX_WORKERS = int(os.getenv("FETCH_MAX_WORKERS", "8"))  # 동시 수집 스레드 수
+FETCH_TIMEOUT = float(os.getenv("FETCH_TIMEOUT", "120"))  # 스테이션당 최대 대기 시간 (초)
+FETCH_RATE_LIMIT = float(os.getenv("FETCH_RATE_LIMIT", "10"))  # 초당 최대 요청 수 (0이면 제한 없음)
+FETCH_IN_FLIGHT_FACTOR = 2  # 동시에 제출해 두는 요청 수 = 수집 스레드 수 x 이 값
+
+# 벌크 업서트 설정
+UPSERT_BATCH_SIZE = int(os.getenv("UPSERT_BATCH_SIZE", "500"))  # INSERT 한 번에 보내는 행 수
+UPSERT_COMMIT_INTERVAL = int(os.getenv("UPSERT_COMMIT_INTERVAL", "5000"))  # 커밋 간격 (행 수)
+
+# 스트리밍 파이프라인 설정
+STREAM_CHUNK_SIZE = int(os.getenv("STREAM_CHUNK_SIZE", "50"))  # 집계/기록 단위 (스테이션 수)
+STREAM_MAX_PENDING = int(os.getenv("STREAM_MAX_PENDING", "4"))  # 기록 대기 중인 최대 청크 수
+
+# 진행 상황 콜백 최소 간격 (초)
+PROGRESS_INTERVAL = float(os.getenv("PROGRESS_INTERVAL", "1.0"))
+
+# 로그/실패 리포트 디렉토리
+LOG_DIR = "logs"
+
+
+# 로그 파일 설정 (Streamlit 페이지, CLI 공통)
+def setup_logging():
+    os.makedirs(LOG_DIR, exist_ok=True)
+    log_time = datetime.now().strftime("%Y%m%d_%H%M%S")
+    log_file = f"{LOG_DIR}/weather_parsing_{log_time}.log"
+
+    logging.basicConfig(
+        filename=log_file,
+        level=logging.INFO,
+        format="%(asctime)s [%(levelname)s] %(message)s"
+    )
+    return log_file
+
+
+# 업서트 시 갱신하는 측정값 열
+UPDATE_COLUMNS = ['tavg', 'tmin', 'tmax', 'prcp', 'snow', 'avg_wdir', 'wspd', 'pres', 'tsun', 'avg_rhum', 'avg_dwpt']
+
+# 날씨 테이블에 기록하는 열 (측정값 내용 해시 포함)
+WRITE_COLUMNS = DAILY_COLUMNS + ['row_hash']
+
+# 해시 전 측정값 반올림 자릿수 (집계 순서에 따른 부동소수점 오차 무시)
+HASH_DECIMALS = 6
+
+# Stations() 메타데이터 열 -> stations 테이블 열
+STATION_META_COLUMNS = {
+    'name': 'Station_Name',
+    'country': 'Country',
+    'region': 'Region',
+    'wmo': 'WMO',
+    'icao': 'ICAO',
+    'latitude': 'Latitude',
+    'longitude': 'Longitude',
+    'elevation': 'Elevation',
+    'timezone': 'Timezone',
+}
+
+
+# US 스테이션 카탈로그 (로컬 파일 캐시, STATION_CATALOG_TTL_HOURS가 지나면 meteostat에서 갱신)
+def load_station_catalog(refresh=False):
+    return STATION_CATALOG.get(lambda: Stations().region('US').fetch(), refresh)
+
+
+# 수집 대상 스테이션 (bbox=(min_lat, min_lon, max_lat, max_lon) 또는 near=(lat, lon)과 radius_km로 좁힘)
+def select_stations(bbox=None, near=None, radius_km=None):
+    return load_station_catalog().select(bbox, near, radius_km)
+
+
+# DB 데이터 조회 함수 (날짜 필터 추가)
+def fetch_from_db_with_date(conn, table_name, start_date=None, end_date=None):
+    # datetime 입력은 날짜 정보만 사용
+    start_date = pd.Timestamp(start_date).date() if start_date else None
+    end_date = pd.Timestamp(end_date).date() if end_date else None
+
+    query = f"SELECT * FROM {table_name}"
+    conditions, params = date_range_condition(start_date, end_date)
+    if conditions:
+        query += " WHERE " + " AND ".join(conditions)
+    return read_frame(conn, query, params)
+
+
+# ON DUPLICATE KEY UPDATE 절 (측정값 열과 내용 해시만 갱신)
+def build_update_clause():
+    return ",\n            ".join(f"{col}=VALUES({col})" for col in UPDATE_COLUMNS + ['row_hash'])
+
+
+# 다중 행 INSERT ... ON DUPLICATE KEY UPDATE 쿼리 생성
+def build_upsert_query(table_name, row_count):
+    placeholders = "(" + ", ".join(["%s"] * len(WRITE_COLUMNS)) + ")"
+    return f"""
+        INSERT INTO {table_name} ({", ".join(WRITE_COLUMNS)})
+        VALUES {", ".join([placeholders] * row_count)}
+        ON DUPLICATE KEY UPDATE
+            {build_update_clause()};
+    """
+
+
+# 행별 측정값 내용 해시 (부호 있는 64비트, NULL도 구분)
+def row_hashes(data):
+    values = data[UPDATE_COLUMNS].astype('float64').round(HASH_DECIMALS)
+    return pd.util.hash_pandas_object(values, index=False).to_numpy().view('int64')
+
+
+# 내용 해시 열이 없으면 추가
+def with_row_hash(data):
+    if 'row_hash' in data:
+        return data
+    return data.assign(row_hash=row_hashes(data))
+
+
+# DataFrame -> DB 드라이버용 튜플 목록 (NaN은 NULL로)
+def frame_to_rows(data):
+    if 'Station ID' in data:
+        data = data.rename(columns={'Station ID': 'Station_ID'})
+    if 'Station Name' in data:
+        data = data.rename(columns={'Station Name': 'Station_Name'})
+    values = with_row_hash(data)[WRITE_COLUMNS].astype(object)
+    values = values.where(values.notna(), None)
+    return list(map(tuple, values.to_numpy().tolist()))
+
+
+# 배치의 키 중 테이블에 이미 있는 키 수와 고유 키 수 (bulk_load_upsert의 스테이징 JOIN과 같은 기준)
+# 서버의 Duplicates/rowcount는 같은 값으로 덮어쓴 행을 세지 않으므로 (CLIENT.FOUND_ROWS 없이) 업서트 전에 직접 셈
+def count_existing_keys(cur, table_name, rows):
+    keys = list(dict.fromkeys((row[0], row[1]) for row in rows))
+    cur.execute(f"""
+        SELECT COUNT(*) AS existing_count FROM {table_name}
+        WHERE (Station_ID, Date) IN ({", ".join(["(%s, %s)"] * len(keys))})
+    """, [value for key in keys for value in key])
+    return cur.fetchone()['existing_count'], len(keys)
+
+
+# 배치 업서트 (실패 시 배치를 반으로 나눠 실패 행만 격리)
+def upsert_batch(conn, cur, table_name, rows, failed_rows):
+    try:
+        existing_count, key_count = count_existing_keys(cur, table_name, rows)
+        cur.execute(build_upsert_query(table_name, len(rows)), [value for row in rows for value in row])
+        # 새 키만 삽입, 나머지(기존 키, 배치 안에서 반복된 키)는 업데이트
+        inserted_count = key_count - existing_count
+        return inserted_count, len(rows) - inserted_count
+    except pymysql.MySQLError as e:
+        if not conn.open:
+            raise
+        if len(rows) == 1:
+            row = dict(zip(WRITE_COLUMNS, rows[0]))
+            logging.warning(f"Failed to upsert data for Station {row['Station_ID']} at {row['Date']}: {e}")
+            failed_rows.append(rows[0])
+            return 0, 0
+        mid = len(rows) // 2
+        inserted_left, updated_left = upsert_batch(conn, cur, table_name, rows[:mid], failed_rows)
+        inserted_right, updated_right = upsert_batch(conn, cur, table_name, rows[mid:], failed_rows)
+        return inserted_left + inserted_right, updated_left + updated_right
+
+
+# 커밋 후 처리: 기록된 (지역, 날짜)의 요약 롤업 재계산, 테이블 데이터 버전 증가 (DB_Check 조회 캐시 무효화)
+def refresh_after_write(conn, table_name, data):
+    if 'Station_ID' not in data:
+        data = data.rename(columns={'Station ID': 'Station_ID'})
+    refresh_rollups(conn, table_name, data[['Station_ID', 'Date']])
+    bump_data_version(conn, table_name)
+
+
+# 공용 벌크 업서트 함수
+def bulk_upsert(conn, table_name, data, batch_size=UPSERT_BATCH_SIZE, commit_interval=UPSERT_COMMIT_INTERVAL,
+                metrics=None):
+    inserted_count = 0
+    updated_count = 0
+    failed_rows = []
+
+    if data.empty:
+        return inserted_count, updated_count, failed_rows
+
+    rows = frame_to_rows(data)
+    uncommitted = 0
+
+    with conn.cursor() as cur:
+        for start in range(0, len(rows), batch_size):
+            batch = rows[start:start + batch_size]
+            inserted, updated = upsert_batch(conn, cur, table_name, batch, failed_rows)
+            inserted_count += inserted
+            updated_count += updated
+
+            uncommitted += len(batch)
+            if uncommitted >= commit_interval:
+                with timed(metrics, 'commit_seconds'):
+                    conn.commit()
+                uncommitted = 0
+
+    with timed(metrics, 'commit_seconds'):
+        conn.commit()
+    refresh_after_write(conn, table_name, data)
+    return inserted_count, updated_count, failed_rows
+
+
+# LOAD DATA 기본 형식(탭 구분, 역슬래시 이스케이프, NULL은 \N)으로 값 변환
+def to_tsv_value(value):
+    if value is None:
+        return "\\N"
+    return str(value).replace("\\", "\\\\").replace("\t", "\\t").replace("\n", "\\n")
+
+
+# 스테이징 테이블 + LOAD DATA LOCAL INFILE 업서트 (대량 백필용)
+def bulk_load_upsert(conn, table_name, data, metrics=None):
+    if data.empty:
+        return 0, 0
+
+    staging_table = f"{table_name}_staging"
+    columns = ", ".join(WRITE_COLUMNS)
+
+    # 집계 결과를 임시 TSV 파일로 저장
+    with tempfile.NamedTemporaryFile("w", suffix=".tsv", encoding="utf-8", newline="\n", delete=False) as f:
+        tsv_path = f.name
+        for row in frame_to_rows(data):
+            f.write("\t".join(to_tsv_value(value) for value in row) + "\n")
+
+    try:
+        with conn.cursor() as cur:
+            cur.execute(f"DROP TEMPORARY TABLE IF EXISTS {staging_table}")
+            # LIKE는 파티션 정의까지 복사하므로 (임시 테이블은 파티션 불가) 열과 키만 복사
+            cur.execute(f"""
+                CREATE TEMPORARY TABLE {staging_table} (PRIMARY KEY (Station_ID, Date))
+                SELECT {columns} FROM {table_name} LIMIT 0
+            """)
+            cur.execute(
+                f"LOAD DATA LOCAL INFILE %s INTO TABLE {staging_table} CHARACTER SET utf8mb4 ({columns})",
+                (tsv_path,)
+            )
+            staged_count = cur.rowcount
+
+            # 이미 존재하는 키 수 = 업데이트 건수 (upsert_future_data와 동일한 기준)
+            cur.execute(f"""
+                SELECT COUNT(*) AS updated_count
+                FROM {staging_table} s
+                JOIN {table_name} t ON t.Station_ID = s.Station_ID AND t.Date = s.Date
+            """)
+            updated_count = cur.fetchone()['updated_count']
+
+            # 집합 단위 병합
+            cur.execute(f"""
+                INSERT INTO {table_name} ({columns})
+                SELECT {columns} FROM {staging_table}
+                ON DUPLICATE KEY UPDATE
+                    {build_update_clause()};
+            """)
+            cur.execute(f"DROP TEMPORARY TABLE IF EXISTS {staging_table}")
+        with timed(metrics, 'commit_seconds'):
+            conn.commit()
+    except pymysql.MySQLError:
+        conn.rollback()
+        raise
+    finally:
+        os.remove(tsv_path)
+
+    refresh_after_write(conn, table_name, data)
+
+    return staged_count - updated_count, updated_count
+
+
+# 스테이션 메타데이터 업서트 (실행당 한 번)
+def upsert_stations(conn, stations):
+    metadata = stations[list(STATION_META_COLUMNS)].rename(columns=STATION_META_COLUMNS).astype(object)
+    metadata = metadata.where(metadata.notna(), None)
+    rows = [(station_id, *values) for station_id, values in zip(metadata.index, metadata.to_numpy().tolist())]
+
+    columns = list(STATION_META_COLUMNS.values())
+    updates = ", ".join(f"{col}=VALUES({col})" for col in columns)
+    with conn.cursor() as cur:
+        cur.executemany(f"""
+            INSERT INTO {STATIONS_TABLE} (Station_ID, {", ".join(columns)})
+            VALUES ({", ".join(["%s"] * (len(columns) + 1))})
+            ON DUPLICATE KEY UPDATE {updates}
+        """, rows)
+    conn.commit()
+    return len(rows)
+
+
+# 과거 데이터 삽입 (중복 데이터 무시)
+def insert_past_data(conn, table_name, data):
+    inserted_count, updated_count, _ = bulk_upsert(conn, table_name, data)
+    return inserted_count + updated_count
+
+# 미래 데이터 삽입 또는 업데이트
+def upsert_future_data(conn, table_name, data):
+    inserted_count, updated_count, _ = bulk_upsert(conn, table_name, data)
+    return inserted_count, updated_count
+
+
+# 데이터 삽입 함수
+def insert_data_from_csv(conn, table_name, data):
+    inserted_count, updated_count, _ = bulk_upsert(conn, table_name, data)
+    return inserted_count, updated_count
+
+
+# 청크의 (Station_ID, Date)에 저장된 내용 해시 (인덱스: Station_ID, Date)
+def load_row_hashes(conn, table_name, data):
+    station_ids = data['Station_ID'].unique().tolist()
+    conditions, params = date_range_condition(data['Date'].min(), data['Date'].max())
+    conditions.append(f"Station_ID IN ({', '.join(['%s'] * len(station_ids))})")
+    conditions.append("row_hash IS NOT NULL")  # 해시 열 추가 전 행은 한 번 다시 기록
+    stored = read_frame(
+        conn, f"SELECT Station_ID, Date, row_hash FROM {table_name} WHERE {' AND '.join(conditions)}",
+        params + station_ids)
+    index = pd.MultiIndex.from_arrays([stored['Station_ID'].astype(str), pd.to_datetime(stored['Date'])])
+    return pd.Series(stored['row_hash'].to_numpy(), index=index, dtype='Int64')
+
+
+# 저장된 값과 내용 해시가 같은 행을 제외 (새 행/바뀐 행만, 제외한 행 수)
+def changed_rows(conn, table_name, data):
+    if data.empty:
+        return data, 0
+    data = with_row_hash(data)
+    stored = load_row_hashes(conn, table_name, data)
+    keys = pd.MultiIndex.from_arrays([data['Station_ID'].astype(str), pd.to_datetime(data['Date'])])
+    unchanged = stored.reindex(keys).eq(data['row_hash'].to_numpy()).fillna(False).to_numpy(dtype=bool)
+    return data[~unchanged], int(unchanged.sum())
+
+
+# 파이프라인 쓰기 단계용 청크 기록 함수 (바뀐 행만 기록, 청크마다 커밋 후 스테이션 워터마크 갱신)
+def make_chunk_writer(conn, table_name, bulk_load=False, complete_through=None, issued_at=None, metrics=None,
+                      rows_by_station=None):
+    """write_chunk(chunk) -> (삽입 행 수, 업데이트 행 수, 변경 없어 건너뛴 행 수)
+    rows_by_station: 주면 스테이션별로 실제 기록한 (새 행/바뀐 행) 수를 누적"""
+    def write_chunk(chunk):
+        changed, unchanged_count = changed_rows(conn, table_name, chunk)
+        failed_rows = []
+        if bulk_load:
+            inserted_count, updated_count = bulk_load_upsert(conn, table_name, changed, metrics=metrics)
+        else:
+            inserted_count, updated_count, failed_rows = bulk_upsert(conn, table_name, changed, metrics=metrics)
+        if metrics is not None:
+            metrics.count('rows_written', inserted_count + updated_count)
+        # 실패한 행이 있는 스테이션은 다음 실행에서 다시 수집 (건너뛴 행도 워터마크에는 반영)
+        failed_station_ids = {row[0] for row in failed_rows}
+        if rows_by_station is not None:
+            written = changed['Station_ID'].astype(str).value_counts()
+            failed = pd.Series([row[0] for row in failed_rows], dtype=object).value_counts()
+            for station_id, count in written.sub(failed, fill_value=0).items():
+                rows_by_station[station_id] = rows_by_station.get(station_id, 0) + int(count)
+        update_watermarks(conn, table_name, chunk, complete_through, issued_at, failed_station_ids)
+        return inserted_count, updated_count, unchanged_count
+    return write_chunk
+
+
+# 실패 리포트 열
+FAILED_COLUMNS = ['Station ID', 'Station Name', 'Error', 'Error Type']
+
+
+# 스테이션이 빈 데이터를 돌려줌 (하루 이상 구간에서 다운로드 실패 없이, 재시도해도 같은 결과)
+class EmptyDataError(ValueError):
+    pass
+
+
+# 요청 구간이 하루보다 짧아 빈 결과가 "데이터 없음"의 근거가 되지 않음 (아직 게시 전일 수 있음)
+class PendingDataError(EmptyDataError):
+    pass
+
+
+# meteostat 다운로드 실패 (HTTP 429/5xx 등을 meteostat이 경고로만 남기고 빈 데이터를 돌려준 경우)
+class DownloadError(ConnectionError):
+    pass
+
+
+# 실패 원인 분류: empty(데이터 없음), timeout, transient(네트워크/서버 일시 오류), error(그 외)
+def classify_error(error):
+    if isinstance(error, PendingDataError):
+        return 'transient'
+    if isinstance(error, EmptyDataError):
+        return 'empty'
+    if isinstance(error, TimeoutError):
+        return 'timeout'
+    if isinstance(error, HTTPError):
+        return 'transient' if error.code == 429 or error.code >= 500 else 'error'
+    if isinstance(error, OSError):  # ConnectionError, URLError 등
+        return 'transient'
+    return 'error'
+
+
+# 요청 속도 제한 (여러 스레드가 공유)
+class RateLimiter:
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate and rate > 0 else 0.0
+        self.lock = threading.Lock()
+        self.next_time = time.monotonic()
+
+    def acquire(self):
+        if not self.interval:
+            return
+        with self.lock:
+            now = time.monotonic()
+            wait_time = self.next_time - now
+            self.next_time = max(now, self.next_time) + self.interval
+        if wait_time > 0:
+            time.sleep(wait_time)
+
+
+# meteostat은 다운로드 실패(HTTPError)를 예외 대신 "Cannot load <file> from <endpoint>" 경고로 남김
+METEOSTAT_LOAD_WARNING = "Cannot load"
+
+# 수집 스레드별로 모은 다운로드 실패 경고 (catch_warnings는 프로세스 전역이라 여러 스레드에서 쓸 수 없음)
+fetch_warnings = threading.local()
+
+
+# 수집하는 동안에만 설치하는 경고 훅 (동시에 도는 수집끼리 공유하고, 마지막 수집이 끝나면 원래대로 되돌림)
+class LoadWarningHook:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.users = 0
+        self.show_warning = None
+        self.filter = None
+
+    def showwarning(self, message, category, filename, lineno, file=None, line=None):
+        captured = getattr(fetch_warnings, 'messages', None)
+        if captured is not None and str(message).startswith(METEOSTAT_LOAD_WARNING):
+            captured.append(str(message))
+        else:
+            self.show_warning(message, category, filename, lineno, file, line)
+
+    @contextmanager
+    def installed(self):
+        with self.lock:
+            if self.users == 0:
+                self.show_warning = warnings.showwarning
+                warnings.showwarning = self.showwarning
+                # 같은 파일의 실패도 매번 전달 (기본 동작은 위치/내용별로 한 번만 표시)
+                existing = list(warnings.filters)
+                warnings.filterwarnings("always", message=METEOSTAT_LOAD_WARNING)
+                self.filter = warnings.filters[0] if warnings.filters[0] not in existing else None
+            self.users += 1
+        try:
+            yield
+        finally:
+            with self.lock:
+                self.users -= 1
+                if self.users == 0:
+                    # 그 사이 다른 코드가 훅을 바꿨으면 그대로 둠
+                    if warnings.showwarning == self.showwarning:
+                        warnings.showwarning = self.show_warning
+                    if self.filter in warnings.filters:
+                        warnings.filters.remove(self.filter)
+                    self.filter = None
+
+
+LOAD_WARNING_HOOK = LoadWarningHook()
+
+
+# 실패한 다운로드는 meteostat 로컬 캐시에 빈 데이터로 저장되므로 삭제 (남아 있으면 재시도도 캐시를 읽음)
+def forget_failed_loads(messages):
+    cache_dir = getattr(Hourly, 'cache_dir', None)
+    if cache_dir is None:
+        return
+    for message in messages:
+        match = re.match(rf"{METEOSTAT_LOAD_WARNING} (\S+) from", message)
+        if match:
+            file = hashlib.md5(match.group(1).encode("utf-8")).hexdigest()
+            try:
+                os.remove(f"{cache_dir}/{Hourly.cache_subdir}/{file}")
+            except OSError:
+                pass
+
+
+# 스테이션 단위 Hourly 데이터 수집 (워커 스레드에서 실행)
+def fetch_station_hourly(station_id, start_date, end_date, rate_limiter, started_at, metrics=None):
+    rate_limiter.acquire()
+    started_at[station_id] = time.monotonic()
+    fetch_warnings.messages = []
+    try:
+        with timed(metrics, 'fetch_seconds'):
+            data = Hourly(station_id, start_date, end_date).fetch()
+        failed_loads = fetch_warnings.messages
+    finally:
+        fetch_warnings.messages = None
+    if failed_loads:
+        forget_failed_loads(failed_loads)
+    if data.empty:
+        if failed_loads:
+            raise DownloadError(failed_loads[0])
+        if end_date - start_date < timedelta(hours=23):
+            raise PendingDataError(f"No data yet for {start_date:%Y-%m-%d %H:%M} to {end_date:%Y-%m-%d %H:%M}")
+        raise EmptyDataError("No data fetched")
+    if failed_loads:
+        logging.warning(f"Station {station_id}: partial data, {len(failed_loads)} files failed to load")
+    return data
+
+
+# 스테이션 Hourly 데이터를 완료되는 순서대로 내보내는 수집 단계
+def fetch_hourly_stream(stations, start_date, end_date, max_workers=FETCH_MAX_WORKERS,
+                        timeout=FETCH_TIMEOUT, rate_limit=FETCH_RATE_LIMIT, station_starts=None, metrics=None):
+    """(station, data, error) 튜플을 생성. 실패 시 data는 None. station_starts로 스테이션별 시작 시각 지정"""
+    station_starts = station_starts or {}
+    rate_limiter = RateLimiter(rate_limit)
+    started_at = {}  # 스테이션별 실제 요청 시작 시각 (타임아웃 판정용)
+    executor = ThreadPoolExecutor(max_workers=max(1, max_workers))
+    pending = {}
+    queued = stations.itertuples()
+    max_in_flight = max(1, max_workers) * FETCH_IN_FLIGHT_FACTOR
+
+    # 결과를 하나 꺼낼 때마다 하나씩 제출 (쓰기 단계가 밀려도 받아 둔 Hourly 데이터가 쌓이지 않음)
+    def submit_next():
+        station = next(queued, None)
+        if station is not None:
+            station_start = station_starts.get(station.Index, start_date)
+            future = executor.submit(
+                fetch_station_hourly, station.Index, station_start, end_date, rate_limiter, started_at, metrics)
+            pending[future] = station
+
+    # 다운로드 실패 경고는 수집하는 동안에만 가로챔 (프로세스 전역 경고 설정을 계속 바꿔 두지 않음)
+    with LOAD_WARNING_HOOK.installed():
+        for _ in range(max_in_flight):
+            submit_next()
+
+        try:
+            while pending:
+                done, _ = wait(pending, timeout=1.0, return_when=FIRST_COMPLETED)
+
+                # 타임아웃된 스테이션은 대기를 중단하고 실패로 처리
+                now = time.monotonic()
+                for future, station in pending.items():
+                    if future in done or not future.running():
+                        continue
+                    if now - started_at.get(station.Index, now) > timeout:
+                        done.add(future)
+
+                for future in done:
+                    station = pending.pop(future)
+                    submit_next()
+                    try:
+                        if not future.done():
+                            raise TimeoutError(f"Fetch timed out after {timeout}s")
+                        yield station, future.result(), None
+                    except Exception as e:
+                        yield station, None, e
+        finally:
+            # 타임아웃으로 버려진 요청은 기다리지 않음
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+# 집계된 청크를 별도 스레드에서 순서대로 기록하는 쓰기 단계
+class ChunkWriter:
+    def __init__(self, write_chunk, max_pending=STREAM_MAX_PENDING, metrics=None):
+        self.write_chunk = write_chunk
+        self.metrics = metrics
+        self.queue = queue.Queue(maxsize=max(1, max_pending))  # 가득 차면 수집 단계가 대기 (메모리 상한)
+        self.results = []
+        self.error = None
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def run(self):
+        while True:
+            chunk = self.queue.get()
+            if chunk is None:
+                break
+            if self.error is not None:
+                continue
+            try:
+                # 프로세스 풀 집계 결과는 넣은 순서대로 기다리므로 기록 순서가 항상 같음
+                chunk = resolve_chunk(chunk, self.metrics)
+                with timed(self.metrics, 'write_seconds'):
+                    self.results.append(self.write_chunk(chunk))
+            except Exception as e:
+                self.error = e
+                logging.warning(f"Failed to aggregate or write chunk: {e}")
+
+    def put(self, chunk):
+        if self.error is not None:
+            raise self.error
+        self.queue.put(chunk)
+
+    def close(self):
+        self.queue.put(None)
+        self.thread.join()
+        if self.error is not None:
+            raise self.error
+        return self.results
+
+
+# 진행 상황 스냅샷 (progress 콜백에 전달)
+def progress_snapshot(processed, total, success_count, failure_count, start_time):
+    elapsed_time = time.time() - start_time
+    remaining_time = (elapsed_time / processed) * (total - processed) if processed else 0.0
+    return {
+        'processed': processed,
+        'total': total,
+        'success_count': success_count,
+        'failure_count': failure_count,
+        'elapsed_seconds': elapsed_time,
+        'remaining_seconds': remaining_time,
+        'completion_time': datetime.now() + timedelta(seconds=remaining_time),
+    }
+
+
+# 실패 스테이션 리포트 저장
+def save_failed_stations(failed_stations):
+    if not failed_stations:
+        return None
+    os.makedirs(LOG_DIR, exist_ok=True)
+    failed_df = pd.DataFrame(failed_stations, columns=FAILED_COLUMNS)
+    failed_csv = f"{LOG_DIR}/failed_stations_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
+    failed_df.to_csv(failed_csv, index=False)
+    logging.info(f"Failed station details saved to {failed_csv}")
+    return failed_csv
+
+
+# 수집 -> 집계 -> 기록 스트리밍 파이프라인
+def run_ingest_pipeline(start_date, end_date, write_chunk, max_workers=FETCH_MAX_WORKERS,
+                        timeout=FETCH_TIMEOUT, rate_limit=FETCH_RATE_LIMIT, chunk_size=STREAM_CHUNK_SIZE,
+                        stations=None, station_starts=None, hourly_store=None,
+                        progress=None, progress_interval=PROGRESS_INTERVAL, processes=AGGREGATE_PROCESSES,
+                        metrics=None, pool=None):
+    """chunk_size개 스테이션마다 Daily 데이터를 집계해 write_chunk로 바로 기록 (청크 단위 커밋).
+    processes > 0이면 집계를 프로세스 풀에서 실행. metrics(RunMetrics)에 단계별 시간을 기록.
+    pool(AggregatePool)을 넘기면 processes 대신 그 풀을 사용하고 닫지 않음 (여러 번 호출할 때 재사용).
+    progress 콜백은 최대 progress_interval초마다 (그리고 마지막에) 한 번 호출"""
+    if stations is None:
+        stations = select_stations()
+    hourly_frames = []
+    failed_stations = []
+
+    total_stations = len(stations)
+    success_count = 0
+    failure_count = 0
+
+    start_time = time.time()  # 파싱 시작 시간 기록
+    last_report = 0.0
+
+    # 프로세스 풀을 쓰면 워커 수만큼 청크가 동시에 집계되도록 대기열을 늘림
+    own_pool = pool is None
+    if own_pool:
+        pool = AggregatePool(processes, metrics)
+    writer = ChunkWriter(write_chunk, max(STREAM_MAX_PENDING, pool.processes), metrics)
+    try:
+        stream = fetch_hourly_stream(
+            stations, start_date, end_date, max_workers, timeout, rate_limit, station_starts, metrics)
+        for index, (station, data, error) in enumerate(stream, start=1):
+            station_id = station.Index
+            if error is None:
+                hourly_frames.append((station_id, data))
+                success_count += 1
+                if hourly_store is not None:
+                    # 재집계용 원본 Hourly 데이터 로컬 저장 (실패해도 수집은 계속)
+                    try:
+                        hourly_store.write(station_id, data)
+                    except Exception as e:
+                        logging.warning(f"Failed to store hourly data for station {station_id}: {e}")
+            else:
+                # 파싱 실패 시 기록 (원인 분류 포함)
+                error_type = classify_error(error)
+                failed_stations.append((station_id, station.name, str(error), error_type))
+                failure_count += 1
+                if metrics is not None:
+                    metrics.count(f'failed_{error_type}')
+                logging.warning(f"Failed to parse station {station.name} (ID: {station_id}) [{error_type}]: {error}")
+
+            # 청크가 차면 집계해서 쓰기 단계로 넘김
+            if len(hourly_frames) >= chunk_size:
+                writer.put(pool.submit(hourly_frames, metrics))
+                hourly_frames = []
+
+            # 진행 상황 보고 (UI/출력 갱신 비용을 줄이기 위해 간격 제한)
+            now = time.monotonic()
+            if progress is not None and (now - last_report >= progress_interval or index == total_stations):
+                last_report = now
+                progress(progress_snapshot(index, total_stations, success_count, failure_count, start_time))
+
+        if hourly_frames:
+            writer.put(pool.submit(hourly_frames, metrics))
+    finally:
+        # 이미 넘긴 청크는 모두 기록(커밋)하고 종료
+        try:
+            results = writer.close()
+        finally:
+            if own_pool:
+                pool.close()
+
+    if hourly_store is not None:
+        hourly_store.evict()
+
+    if metrics is not None:
+        metrics.count('stations_fetched', success_count)
+        metrics.count('stations_failed', failure_count)
+    return results, failed_stations
+
+
+# 로컬 Hourly 저장소에서 다시 집계해 기록 (meteostat 재수집 없음)
+def reaggregate_from_store(hourly_store, start_date, end_date, write_chunk, chunk_size=STREAM_CHUNK_SIZE,
+                           station_ids=None, processes=AGGREGATE_PROCESSES, metrics=None):
+    hourly_frames = []
+    pool = AggregatePool(processes, metrics)
+    writer = ChunkWriter(write_chunk, max(STREAM_MAX_PENDING, processes), metrics)
+    try:
+        for station_id, data in hourly_store.read(start_date, end_date, station_ids):
+            hourly_frames.append((station_id, data))
+            if len(hourly_frames) >= chunk_size:
+                writer.put(pool.submit(hourly_frames))
+                hourly_frames = []
+        if hourly_frames:
+            writer.put(pool.submit(hourly_frames))
+    finally:
+        try:
+            results = writer.close()
+        finally:
+            pool.close()
+    return results
+
+
+# 데이터 파싱 함수 (DB 기록 없이 전체 Daily 데이터를 반환)
+def parse_weather_data(start_date, end_date, max_workers=FETCH_MAX_WORKERS,
+                       timeout=FETCH_TIMEOUT, rate_limit=FETCH_RATE_LIMIT, processes=AGGREGATE_PROCESSES):
+    chunks, failed_stations = run_ingest_pipeline(
+        start_date, end_date, lambda chunk: chunk, max_workers, timeout, rate_limit, processes=processes)
+    save_failed_stations(failed_stations)
+    if chunks:
+        all_weather_data = pd.concat(chunks, ignore_index=True)[DAILY_COLUMNS]
+    else:
+        all_weather_data = pd.DataFrame(columns=DAILY_COLUMNS)
+    return all_weather_data, failed_stations
+
+
+# 빈 데이터로 실패한 스테이션 (다음 실행에서 건너뛸 후보)
+def empty_station_ids(failed_stations):
+    return [station_id for station_id, _, _, error_type in failed_stations if error_type == 'empty']
+
+
+# 수집 결과 요약 (metrics가 있으면 실행 기록도 저장)
+def summarize_results(write_results, failed_stations=(), stations_to_fetch=None, metrics=None):
+    result = {
+        'stations_to_fetch': stations_to_fetch,
+        'inserted_count': sum(inserted for inserted, _, _ in write_results),
+        'updated_count': sum(updated for _, updated, _ in write_results),
+        'unchanged_count': sum(unchanged for _, _, unchanged in write_results),
+        'failed_stations': list(failed_stations),
+        'failed_csv': save_failed_stations(failed_stations),
+    }
+    if metrics is not None:
+        metrics.count('rows_inserted', result['inserted_count'])
+        metrics.count('rows_updated', result['updated_count'])
+        metrics.count('rows_unchanged', result['unchanged_count'])
+        result['metrics'] = metrics.finish()
+    return result
+
+
+# 과거 실측 데이터 수집 (Streamlit 페이지와 CLI 공통 진입점)
+def ingest_past(conn, start_date, end_date, table_name=PAST_TABLE_NAME, bulk_load=False, incremental=True,
+                hourly_store=None, max_workers=FETCH_MAX_WORKERS, timeout=FETCH_TIMEOUT,
+                rate_limit=FETCH_RATE_LIMIT, chunk_size=STREAM_CHUNK_SIZE, progress=None,
+                progress_interval=PROGRESS_INTERVAL, processes=AGGREGATE_PROCESSES, stations=None):
+    with RunMetrics('past', table_name) as metrics:
+        if stations is None:
+            stations = select_stations()
+        upsert_stations(conn, stations)
+
+        station_starts = None
+        if incremental:
+            # 워터마크 이후 구간만 수집, 이미 최신인 스테이션은 제외
+            stations, station_starts = plan_past_fetch(conn, table_name, stations, start_date, end_date)
+
+        write_chunk = make_chunk_writer(
+            conn, table_name, bulk_load, complete_through=last_complete_date(end_date), metrics=metrics)
+        write_results, failed_stations = run_ingest_pipeline(
+            start_date, end_date, write_chunk, max_workers, timeout, rate_limit, chunk_size,
+            stations, station_starts, hourly_store, progress, progress_interval, processes, metrics)
+        record_empty_stations(conn, table_name, empty_station_ids(failed_stations))
+        return summarize_results(write_results, failed_stations, len(stations), metrics)
+
+
+# 예보 데이터 수집 (Streamlit 페이지와 CLI 공통 진입점)
+def ingest_future(conn, start_date, end_date, table_name=FUTURE_TABLE_NAME, bulk_load=False, incremental=True,
+                  hourly_store=None, max_workers=FETCH_MAX_WORKERS, timeout=FETCH_TIMEOUT,
+                  rate_limit=FETCH_RATE_LIMIT, chunk_size=STREAM_CHUNK_SIZE, progress=None,
+                  progress_interval=PROGRESS_INTERVAL, processes=AGGREGATE_PROCESSES, stations=None):
+    with RunMetrics('future', table_name) as metrics:
+        if stations is None:
+            stations = select_stations()
+        upsert_stations(conn, stations)
+
+        if incremental:
+            # 최근에 수집한 예보는 건너뜀
+            stations, _ = plan_forecast_fetch(conn, table_name, stations, start_date, end_date)
+
+        write_chunk = make_chunk_writer(conn, table_name, bulk_load, issued_at=datetime.now(), metrics=metrics)
+        write_results, failed_stations = run_ingest_pipeline(
+            start_date, end_date, write_chunk, max_workers, timeout, rate_limit, chunk_size,
+            stations, None, hourly_store, progress, progress_interval, processes, metrics)
+        record_empty_stations(conn, table_name, empty_station_ids(failed_stations))
+        return summarize_results(write_results, failed_stations, len(stations), metrics)
+
+
+# 로컬 Hourly 저장소로 재집계 (Streamlit 페이지와 CLI 공통 진입점)
+def reaggregate(conn, table_name, start_date, end_date, hourly_store, bulk_load=False, chunk_size=STREAM_CHUNK_SIZE,
+                processes=AGGREGATE_PROCESSES):
+    with RunMetrics('reaggregate', table_name) as metrics:
+        # 과거 테이블은 하루 전체가 포함된 날까지만 워터마크를 올림 (기간 끝의 부분 일자는 다음 수집에서 채움)
+        complete_through = last_complete_date(end_date) if table_name == PAST_TABLE_NAME else None
+        write_chunk = make_chunk_writer(conn, table_name, bulk_load, complete_through=complete_through, metrics=metrics)
+        write_results = reaggregate_from_store(
+            hourly_store, start_date, end_date, write_chunk, chunk_size, processes=processes, metrics=metrics)
+        return summarize_results(write_results, metrics=metrics)
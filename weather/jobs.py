@@ -0,0 +1,285 @@
+import logging
+import os
+import socket
+import time
+from datetime import datetime
+import pandas as pd
+from weather import ingest
+from weather.aggregate import AGGREGATE_PROCESSES, AggregatePool
+from weather.db import FUTURE_TABLE_NAME
+from weather.metrics import RunMetrics
+from weather.retry import RETRYABLE_ERRORS
+from weather.schema import JOBS_TABLE, JOB_ITEMS_TABLE
+from weather.watermarks import plan_past_fetch, plan_forecast_fetch, last_complete_date, record_empty_stations
+
+# 작업 큐 워커 설정
+JOB_BATCH_SIZE = int(os.getenv("JOB_BATCH_SIZE", "50"))  # 한 번에 가져가는 스테이션 수
+JOB_STALE_SECONDS = int(os.getenv("JOB_STALE_SECONDS", "900"))  # 이 시간 동안 끝나지 않은 항목은 다른 워커가 가져감
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))  # 항목당 최대 시도 횟수
+JOB_POLL_INTERVAL = float(os.getenv("JOB_POLL_INTERVAL", "5"))  # 할 일이 없을 때 다시 확인하는 간격 (초)
+JOB_PROGRESS_INTERVAL = float(os.getenv("JOB_PROGRESS_INTERVAL", "5"))  # Parsing 페이지의 작업 진행 상황 새로고침 간격 (초)
+
+# 항목 상태: pending -> claimed -> done / failed (일시 오류는 pending으로 되돌림)
+ITEM_STATUSES = ('pending', 'claimed', 'done', 'failed')
+
+
+# 기본 워커 이름 (호스트:PID)
+def default_worker_id():
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+# 스테이션 목록을 작업 항목으로 등록하고 job_id 반환
+def enqueue_job(conn, table_name, start_date, end_date, stations, station_starts=None):
+    station_starts = station_starts or {}
+    with conn.cursor() as cur:
+        cur.execute(f"""
+            INSERT INTO {JOBS_TABLE} (table_name, start_date, end_date, station_count)
+            VALUES (%s, %s, %s, %s)
+        """, (table_name, start_date, end_date, len(stations)))
+        job_id = cur.lastrowid
+        rows = [(job_id, station_id, name, station_starts.get(station_id))
+                for station_id, name in zip(stations.index, stations['name'])]
+        for i in range(0, len(rows), ingest.UPSERT_BATCH_SIZE):
+            cur.executemany(f"""
+                INSERT INTO {JOB_ITEMS_TABLE} (job_id, Station_ID, Station_Name, fetch_start)
+                VALUES (%s, %s, %s, %s)
+            """, rows[i:i + ingest.UPSERT_BATCH_SIZE])
+        if not rows:
+            cur.execute(f"UPDATE {JOBS_TABLE} SET status = 'done', finished_at = NOW() WHERE job_id = %s", (job_id,))
+    conn.commit()
+    logging.info(f"Enqueued job {job_id}: {len(rows)} stations into {table_name}")
+    return job_id
+
+
+# 전체 US 스테이션을 작업으로 등록 (증분 모드면 워터마크로 대상/시작 시각을 미리 계산)
+def enqueue_ingest(conn, table_name, start_date, end_date, incremental=True, stations=None):
+    if stations is None:
+        stations = ingest.select_stations()
+    ingest.upsert_stations(conn, stations)
+
+    station_starts = None
+    if incremental:
+        if table_name == FUTURE_TABLE_NAME:
+            stations, _ = plan_forecast_fetch(conn, table_name, stations, start_date, end_date)
+        else:
+            stations, station_starts = plan_past_fetch(conn, table_name, stations, start_date, end_date)
+    return enqueue_job(conn, table_name, start_date, end_date, stations, station_starts)
+
+
+# 완료 시간이 지난 claim 중 시도 횟수를 다 쓴 항목은 실패로 확정
+def expire_stale_items(conn, job_id, stale_seconds=JOB_STALE_SECONDS, max_attempts=JOB_MAX_ATTEMPTS):
+    with conn.cursor() as cur:
+        cur.execute(f"""
+            UPDATE {JOB_ITEMS_TABLE}
+            SET status = 'failed', error = 'claim expired', error_type = 'timeout', finished_at = NOW()
+            WHERE job_id = %s AND status = 'claimed'
+                AND claimed_at < NOW() - INTERVAL %s SECOND AND attempts >= %s
+        """, (job_id, stale_seconds, max_attempts))
+    conn.commit()
+
+
+# 남은 항목이 없으면 작업 완료 처리
+def finish_job_if_done(conn, job_id):
+    with conn.cursor() as cur:
+        cur.execute(f"""
+            UPDATE {JOBS_TABLE} SET status = 'done', finished_at = NOW()
+            WHERE job_id = %s AND status = 'running' AND NOT EXISTS (
+                SELECT 1 FROM {JOB_ITEMS_TABLE}
+                WHERE job_id = %s AND status IN ('pending', 'claimed')
+            )
+        """, (job_id, job_id))
+    conn.commit()
+
+
+# 진행 중인 작업에서 항목 batch_size개를 가져감 (다른 워커가 잠근 행은 건너뜀)
+def claim_batch(conn, worker_id, batch_size=JOB_BATCH_SIZE, stale_seconds=JOB_STALE_SECONDS,
+                max_attempts=JOB_MAX_ATTEMPTS):
+    """(작업 행, 항목 행 목록) 또는 가져갈 항목이 없으면 None.
+    pending 항목과 stale_seconds 넘게 끝나지 않은 claimed 항목(죽은 워커의 몫)이 대상"""
+    with conn.cursor() as cur:
+        cur.execute(f"""
+            SELECT job_id, table_name, start_date, end_date FROM {JOBS_TABLE}
+            WHERE status = 'running' ORDER BY created_at, job_id
+        """)
+        jobs = cur.fetchall()
+    conn.commit()
+
+    for job in jobs:
+        expire_stale_items(conn, job['job_id'], stale_seconds, max_attempts)
+        with conn.cursor() as cur:
+            cur.execute(f"""
+                SELECT Station_ID, Station_Name, fetch_start FROM {JOB_ITEMS_TABLE}
+                WHERE job_id = %s AND (
+                    status = 'pending'
+                    OR (status = 'claimed' AND claimed_at < NOW() - INTERVAL %s SECOND AND attempts < %s)
+                )
+                ORDER BY Station_ID
+                LIMIT %s
+                FOR UPDATE SKIP LOCKED
+            """, (job['job_id'], stale_seconds, max_attempts, batch_size))
+            items = cur.fetchall()
+            if items:
+                placeholders = ", ".join(["%s"] * len(items))
+                cur.execute(f"""
+                    UPDATE {JOB_ITEMS_TABLE}
+                    SET status = 'claimed', worker_id = %s, claimed_at = NOW(), attempts = attempts + 1
+                    WHERE job_id = %s AND Station_ID IN ({placeholders})
+                """, (worker_id, job['job_id'], *[item['Station_ID'] for item in items]))
+        conn.commit()
+        if items:
+            return job, items
+        finish_job_if_done(conn, job['job_id'])
+    return None
+
+
+# 처리 결과 기록 (이 워커가 아직 가지고 있는 항목만, 일시 오류는 시도 횟수가 남으면 다시 pending)
+def complete_batch(conn, job_id, worker_id, station_ids, failed_stations, rows_by_station,
+                   max_attempts=JOB_MAX_ATTEMPTS):
+    failed_ids = {failed[0] for failed in failed_stations}
+    done_rows = [(rows_by_station.get(station_id, 0), job_id, station_id, worker_id)
+                 for station_id in station_ids if station_id not in failed_ids]
+    failed_rows = [(max_attempts, error_type in RETRYABLE_ERRORS, error, error_type, job_id, station_id, worker_id)
+                   for station_id, _, error, error_type in failed_stations]
+    with conn.cursor() as cur:
+        cur.executemany(f"""
+            UPDATE {JOB_ITEMS_TABLE}
+            SET status = 'done', finished_at = NOW(), rows_written = %s, error = NULL, error_type = NULL
+            WHERE job_id = %s AND Station_ID = %s AND worker_id = %s AND status = 'claimed'
+        """, done_rows)
+        cur.executemany(f"""
+            UPDATE {JOB_ITEMS_TABLE}
+            SET status = IF(attempts < %s AND %s, 'pending', 'failed'),
+                finished_at = NOW(), error = %s, error_type = %s
+            WHERE job_id = %s AND Station_ID = %s AND worker_id = %s AND status = 'claimed'
+        """, failed_rows)
+    conn.commit()
+    finish_job_if_done(conn, job_id)
+
+
+# 가져간 항목들을 수집 -> 집계 -> 기록
+def process_batch(conn, job, items, worker_id, bulk_load=False, hourly_store=None,
+                  max_workers=ingest.FETCH_MAX_WORKERS, timeout=ingest.FETCH_TIMEOUT,
+                  rate_limit=ingest.FETCH_RATE_LIMIT, chunk_size=ingest.STREAM_CHUNK_SIZE,
+                  processes=AGGREGATE_PROCESSES, max_attempts=JOB_MAX_ATTEMPTS,
+                  progress=None, progress_interval=ingest.PROGRESS_INTERVAL, pool=None):
+    table_name = job['table_name']
+    stations = pd.DataFrame(
+        {'name': [item['Station_Name'] for item in items]},
+        index=pd.Index([item['Station_ID'] for item in items], name='id'),
+    )
+    station_starts = {item['Station_ID']: item['fetch_start'] for item in items if item['fetch_start'] is not None}
+
+    with RunMetrics('worker', table_name) as metrics:
+        # 스테이션별 기록 행 수 (변경 없어 건너뛴 행 제외, 작업 항목에 남김)
+        rows_by_station = {}
+        if table_name == FUTURE_TABLE_NAME:
+            write_chunk = ingest.make_chunk_writer(
+                conn, table_name, bulk_load, issued_at=datetime.now(), metrics=metrics,
+                rows_by_station=rows_by_station)
+        else:
+            write_chunk = ingest.make_chunk_writer(
+                conn, table_name, bulk_load, complete_through=last_complete_date(job['end_date']), metrics=metrics,
+                rows_by_station=rows_by_station)
+
+        write_results, failed_stations = ingest.run_ingest_pipeline(
+            job['start_date'], job['end_date'], write_chunk, max_workers, timeout, rate_limit, chunk_size,
+            stations, station_starts, hourly_store, progress, progress_interval, processes, metrics, pool)
+        record_empty_stations(conn, table_name, ingest.empty_station_ids(failed_stations))
+        complete_batch(conn, job['job_id'], worker_id, stations.index, failed_stations, rows_by_station, max_attempts)
+
+        # 실패 내역은 작업 항목에 남으므로 배치마다 실패 리포트 파일을 만들지 않음
+        inserted_count = sum(inserted for inserted, _, _ in write_results)
+        updated_count = sum(updated for _, updated, _ in write_results)
+        unchanged_count = sum(unchanged for _, _, unchanged in write_results)
+        metrics.count('rows_inserted', inserted_count)
+        metrics.count('rows_updated', updated_count)
+        metrics.count('rows_unchanged', unchanged_count)
+        return inserted_count, updated_count, unchanged_count, failed_stations
+
+
+# 작업 큐 워커: 할 일이 없어질 때까지 (exit_when_idle=False면 계속) 항목을 가져가 처리
+def run_worker(conn, worker_id=None, batch_size=JOB_BATCH_SIZE, stale_seconds=JOB_STALE_SECONDS,
+               max_attempts=JOB_MAX_ATTEMPTS, exit_when_idle=True, poll_interval=JOB_POLL_INTERVAL,
+               bulk_load=False, hourly_store=None, max_workers=ingest.FETCH_MAX_WORKERS,
+               timeout=ingest.FETCH_TIMEOUT, rate_limit=ingest.FETCH_RATE_LIMIT,
+               chunk_size=ingest.STREAM_CHUNK_SIZE, processes=AGGREGATE_PROCESSES,
+               progress=None, progress_interval=ingest.PROGRESS_INTERVAL):
+    worker_id = worker_id or default_worker_id()
+    totals = {'batches': 0, 'stations': 0, 'inserted_count': 0, 'updated_count': 0, 'unchanged_count': 0,
+              'failed_count': 0}
+    # 집계 프로세스 풀은 워커 하나당 한 번만 띄워 모든 배치에서 재사용
+    with AggregatePool(processes) as pool:
+        while True:
+            claimed = claim_batch(conn, worker_id, batch_size, stale_seconds, max_attempts)
+            if claimed is None:
+                if exit_when_idle:
+                    break
+                time.sleep(poll_interval)
+                continue
+
+            job, items = claimed
+            logging.info(f"Worker {worker_id} claimed {len(items)} stations from job {job['job_id']}")
+            inserted_count, updated_count, unchanged_count, failed_stations = process_batch(
+                conn, job, items, worker_id, bulk_load, hourly_store, max_workers, timeout, rate_limit,
+                chunk_size, processes, max_attempts, progress, progress_interval, pool)
+            totals['batches'] += 1
+            totals['stations'] += len(items)
+            totals['inserted_count'] += inserted_count
+            totals['updated_count'] += updated_count
+            totals['unchanged_count'] += unchanged_count
+            totals['failed_count'] += len(failed_stations)
+    totals['worker_id'] = worker_id
+    return totals
+
+
+# 최근 작업 목록과 상태별 항목 수
+def load_jobs(conn, limit=10):
+    with conn.cursor() as cur:
+        cur.execute(f"""
+            SELECT j.job_id, j.table_name, j.start_date, j.end_date, j.status, j.station_count,
+                j.created_at, j.finished_at,
+                {", ".join(f"SUM(i.status = '{status}') AS {status}" for status in ITEM_STATUSES)},
+                COUNT(DISTINCT i.worker_id) AS workers,
+                SUM(i.rows_written) AS rows_written
+            FROM (SELECT * FROM {JOBS_TABLE} ORDER BY job_id DESC LIMIT %s) j
+            LEFT JOIN {JOB_ITEMS_TABLE} i ON i.job_id = j.job_id
+            GROUP BY j.job_id
+            ORDER BY j.job_id DESC
+        """, (limit,))
+        jobs = cur.fetchall()
+    conn.commit()
+    for job in jobs:
+        for status in ITEM_STATUSES:
+            job[status] = int(job[status] or 0)
+        job['rows_written'] = int(job['rows_written'] or 0)
+    return jobs
+
+
+# 작업 하나의 워커별 진행 상황
+def load_job_workers(conn, job_id):
+    with conn.cursor() as cur:
+        cur.execute(f"""
+            SELECT worker_id,
+                {", ".join(f"SUM(status = '{status}') AS {status}" for status in ITEM_STATUSES)},
+                SUM(rows_written) AS rows_written,
+                MAX(COALESCE(finished_at, claimed_at)) AS last_seen
+            FROM {JOB_ITEMS_TABLE}
+            WHERE job_id = %s AND worker_id IS NOT NULL
+            GROUP BY worker_id
+            ORDER BY worker_id
+        """, (job_id,))
+        workers = cur.fetchall()
+    conn.commit()
+    return workers
+
+
+# 작업 취소 (남은 pending 항목은 실패 처리, 처리 중인 배치는 그대로 끝남)
+def cancel_job(conn, job_id):
+    with conn.cursor() as cur:
+        cur.execute(f"""
+            UPDATE {JOB_ITEMS_TABLE} SET status = 'failed', error = 'cancelled', error_type = 'error'
+            WHERE job_id = %s AND status = 'pending'
+        """, (job_id,))
+        cur.execute(f"UPDATE {JOBS_TABLE} SET status = 'cancelled', finished_at = NOW() WHERE job_id = %s",
+                    (job_id,))
+    conn.commit()
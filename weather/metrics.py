@@ -0,0 +1,270 @@
+import bisect
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+
+# 단계별 지표 저장 위치 (JSON lines + Prometheus textfile collector용 .prom)
+METRICS_DIR = os.getenv("METRICS_DIR", "logs/metrics")
+RUNS_FILE = "runs.jsonl"  # 수집/재집계 실행 1회당 한 줄
+QUERIES_FILE = "queries.jsonl"  # DB_Check 조회 1회당 한 줄
+INGEST_PROM_FILE = "weather_ingest.prom"
+QUERY_PROM_FILE = "weather_queries.prom"
+
+# 지연 시간 히스토그램 구간 (초)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+# 실행 기록에 남기는 단계별 히스토그램
+STAGE_HISTOGRAMS = {
+    'fetch_seconds': "Per-station meteostat fetch latency",
+    'aggregate_seconds': "Per-chunk hourly -> daily aggregation time",
+    'write_seconds': "Per-chunk DB write time (upsert + commit + rollups + watermarks)",
+    'commit_seconds': "Per-commit latency",
+}
+
+
+# 누적 히스토그램 (Prometheus와 같은 le 구간)
+class Histogram:
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # 마지막 칸은 +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q):
+        """구간 안에서 선형 보간한 근사 분위수"""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for i, count in enumerate(self.counts):
+            if seen + count >= rank and count:
+                lower = self.buckets[i - 1] if i > 0 else 0.0
+                upper = self.buckets[i] if i < len(self.buckets) else lower
+                return lower + (upper - lower) * (rank - seen) / count
+            seen += count
+        return self.buckets[-1]
+
+    def to_dict(self):
+        return {
+            'buckets': list(self.buckets),
+            'counts': self.counts,
+            'sum': self.sum,
+            'count': self.count,
+            'p50': self.quantile(0.5),
+            'p95': self.quantile(0.95),
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        histogram = cls(data['buckets'])
+        histogram.counts = list(data['counts'])
+        histogram.sum = data['sum']
+        histogram.count = data['count']
+        return histogram
+
+
+# 수집/재집계 1회 실행의 단계별 지표 (여러 스레드에서 기록)
+class RunMetrics:
+    def __init__(self, kind, table_name):
+        self.kind = kind
+        self.table_name = table_name
+        self.started_at = datetime.now()
+        self.start_time = time.perf_counter()
+        self.lock = threading.Lock()
+        self.histograms = {name: Histogram() for name in STAGE_HISTOGRAMS}
+        self.counters = {}
+        self.record = None
+
+    def observe(self, name, seconds):
+        with self.lock:
+            self.histograms[name].observe(seconds)
+
+    def count(self, name, value=1):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def to_record(self):
+        elapsed = time.perf_counter() - self.start_time
+        with self.lock:
+            histograms = {name: histogram.to_dict() for name, histogram in self.histograms.items()}
+            counters = dict(self.counters)
+        write_seconds = histograms['write_seconds']['sum']
+        rows_written = counters.get('rows_written', 0)
+        return {
+            'kind': self.kind,
+            'table': self.table_name,
+            'started_at': self.started_at.isoformat(timespec='seconds'),
+            'elapsed_seconds': elapsed,
+            'rows_per_sec': rows_written / elapsed if elapsed else None,
+            'write_rows_per_sec': rows_written / write_seconds if write_seconds else None,
+            'counters': counters,
+            'histograms': histograms,
+        }
+
+    # 실행 기록을 runs.jsonl에 추가하고 .prom 파일 갱신 (한 번만)
+    def finish(self):
+        if self.record is None:
+            self.record = self.to_record()
+            append_jsonl(RUNS_FILE, self.record)
+            write_ingest_prometheus(load_jsonl(RUNS_FILE))
+        return self.record
+
+    def __enter__(self):
+        return self
+
+    # 예외로 끝난 실행도 기록
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            self.count('errors')
+        self.finish()
+
+
+# 블록 실행 시간을 metrics 히스토그램에 기록 (metrics가 없으면 그대로 실행)
+@contextmanager
+def timed(metrics, name):
+    if metrics is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics.observe(name, time.perf_counter() - start)
+
+
+def append_jsonl(file_name, record):
+    os.makedirs(METRICS_DIR, exist_ok=True)
+    with open(os.path.join(METRICS_DIR, file_name), "a", encoding="utf-8") as f:
+        f.write(json.dumps(record) + "\n")
+
+
+# 마지막 limit개 기록만 읽음 (파일 전체를 메모리에 올리지 않음)
+def load_jsonl(file_name, limit=200):
+    path = os.path.join(METRICS_DIR, file_name)
+    if not os.path.exists(path):
+        return []
+    with open(path, encoding="utf-8") as f:
+        lines = deque(f, maxlen=limit)
+    records = []
+    for line in lines:
+        try:
+            records.append(json.loads(line))
+        except ValueError:
+            continue  # 쓰는 도중 끊긴 줄은 무시
+    return records
+
+
+# Prometheus text format 작성 (textfile collector가 반쯤 쓴 파일을 읽지 않도록 교체 방식으로 저장)
+# 임시 파일은 프로세스/스레드마다 달라서 동시에 써도 서로의 파일을 덮거나 옮기지 않음
+def write_prometheus(file_name, lines):
+    os.makedirs(METRICS_DIR, exist_ok=True)
+    path = os.path.join(METRICS_DIR, file_name)
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write("\n".join(lines) + "\n")
+    os.replace(tmp_path, path)
+
+
+def format_labels(labels):
+    return ",".join(f'{key}="{value}"' for key, value in labels.items())
+
+
+def histogram_lines(metric, histogram, labels):
+    lines = []
+    cumulative = 0
+    for bound, count in zip(list(histogram.buckets) + ["+Inf"], histogram.counts):
+        cumulative += count
+        lines.append(f'{metric}_bucket{{{format_labels(dict(labels, le=bound))}}} {cumulative}')
+    lines.append(f"{metric}_sum{{{format_labels(labels)}}} {histogram.sum}")
+    lines.append(f"{metric}_count{{{format_labels(labels)}}} {histogram.count}")
+    return lines
+
+
+# 종류/테이블별 마지막 실행의 지표
+def write_ingest_prometheus(records):
+    latest = {}
+    for record in records:
+        latest[(record['kind'], record['table'])] = record
+
+    lines = []
+    for name, help_text in STAGE_HISTOGRAMS.items():
+        metric = f"weather_ingest_{name}"
+        lines += [f"# HELP {metric} {help_text} (last run)", f"# TYPE {metric} histogram"]
+        for (kind, table_name), record in latest.items():
+            histogram = Histogram.from_dict(record['histograms'][name])
+            lines += histogram_lines(metric, histogram, {'kind': kind, 'table': table_name})
+
+    gauges = {
+        'elapsed_seconds': "Wall time of the last run",
+        'rows_per_sec': "Rows written per second of wall time in the last run",
+        'write_rows_per_sec': "Rows written per second of write-stage time in the last run",
+    }
+    for name, help_text in gauges.items():
+        metric = f"weather_ingest_{name}"
+        lines += [f"# HELP {metric} {help_text}", f"# TYPE {metric} gauge"]
+        for (kind, table_name), record in latest.items():
+            lines.append(f"{metric}{{{format_labels({'kind': kind, 'table': table_name})}}} {record[name] or 0}")
+
+    counter_names = sorted({name for record in latest.values() for name in record['counters']})
+    for name in counter_names:
+        metric = f"weather_ingest_{name}"
+        lines += [f"# HELP {metric} {name.replace('_', ' ').capitalize()} in the last run", f"# TYPE {metric} gauge"]
+        for (kind, table_name), record in latest.items():
+            value = record['counters'].get(name, 0)
+            lines.append(f"{metric}{{{format_labels({'kind': kind, 'table': table_name})}}} {value}")
+
+    metric = "weather_ingest_last_run_timestamp_seconds"
+    lines += [f"# HELP {metric} Start time of the last run", f"# TYPE {metric} gauge"]
+    for (kind, table_name), record in latest.items():
+        timestamp = datetime.fromisoformat(record['started_at']).timestamp()
+        lines.append(f"{metric}{{{format_labels({'kind': kind, 'table': table_name})}}} {timestamp}")
+
+    write_prometheus(INGEST_PROM_FILE, lines)
+
+
+# DB_Check 조회 지표 (프로세스 누적, 조회마다 기록)
+class QueryMetrics:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latency = {}
+        self.rows = {}
+        self.bytes = {}
+
+    def record(self, label, seconds, rows, nbytes):
+        with self.lock:
+            self.latency.setdefault(label, Histogram()).observe(seconds)
+            self.rows[label] = self.rows.get(label, 0) + rows
+            self.bytes[label] = self.bytes.get(label, 0) + nbytes
+            # 잠금 안에서 써야 늦게 만든 이전 스냅샷이 새 파일을 덮지 않음
+            write_prometheus(QUERY_PROM_FILE, self.prometheus_lines())
+        append_jsonl(QUERIES_FILE, {
+            'label': label,
+            'at': datetime.now().isoformat(timespec='seconds'),
+            'seconds': seconds,
+            'rows': rows,
+            'bytes': nbytes,
+        })
+
+    def prometheus_lines(self):
+        metric = "weather_query_seconds"
+        lines = [f"# HELP {metric} DB_Check query latency", f"# TYPE {metric} histogram"]
+        for label, histogram in self.latency.items():
+            lines += histogram_lines(metric, histogram, {'table': label})
+        for name, values, help_text in (("rows", self.rows, "Rows fetched by DB_Check queries"),
+                                        ("bytes", self.bytes, "Arrow bytes fetched by DB_Check queries")):
+            metric = f"weather_query_{name}_total"
+            lines += [f"# HELP {metric} {help_text}", f"# TYPE {metric} counter"]
+            lines += [f"{metric}{{{format_labels({'table': label})}}} {value}" for label, value in values.items()]
+        return lines
+
+
+QUERY_METRICS = QueryMetrics()
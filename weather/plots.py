@@ -0,0 +1,62 @@
+import os
+import numpy as np
+
+# 산점도 렌더링 설정
+PLOT_RAW_POINTS = int(os.getenv("PLOT_RAW_POINTS", "5000"))  # 이 이하면 점을 그대로 그림
+PLOT_SAMPLE_POINTS = int(os.getenv("PLOT_SAMPLE_POINTS", "20000"))  # 표본 모드의 최대 점 수
+PLOT_BINS = int(os.getenv("PLOT_BINS", "120"))  # 밀도 모드의 축별 구간 수
+
+
+# 두 열 모두 값이 있는 행만 (float64 배열)
+def finite_xy(data, x_col, y_col):
+    x = data[x_col].to_numpy(dtype=np.float64, na_value=np.nan)
+    y = data[y_col].to_numpy(dtype=np.float64, na_value=np.nan)
+    mask = np.isfinite(x) & np.isfinite(y)
+    return x[mask], y[mask]
+
+
+# 축 범위 (값이 하나뿐이면 폭을 조금 넓힘)
+def axis_range(values):
+    low, high = float(values.min()), float(values.max())
+    if low == high:
+        low, high = low - 0.5, high + 0.5
+    return low, high
+
+
+# 2차원 히스토그램 (점 수와 관계없이 bins x bins 격자만 그림)
+def bin_points(x, y, bins=PLOT_BINS):
+    """(counts[x_bin, y_bin], x_edges, y_edges). 점이 없으면 None"""
+    if not len(x):
+        return None
+    counts, x_edges, y_edges = np.histogram2d(x, y, bins=bins, range=(axis_range(x), axis_range(y)))
+    return counts.astype(np.int32), x_edges, y_edges
+
+
+# 격자 칸별 층화 표본 (밀도가 낮은 영역의 점도 남도록 칸마다 같은 상한까지 추출)
+def stratified_sample(x, y, budget=PLOT_SAMPLE_POINTS, bins=PLOT_BINS, seed=0):
+    if len(x) <= budget:
+        return x, y
+    x_cells = np.digitize(x, np.linspace(*axis_range(x), bins + 1)[1:-1])
+    y_cells = np.digitize(y, np.linspace(*axis_range(y), bins + 1)[1:-1])
+    cells = x_cells * bins + y_cells
+
+    # 칸별 상한 quota: sum(min(칸의 점 수, quota))가 budget을 넘지 않는 최댓값 (이진 탐색)
+    counts = np.bincount(cells, minlength=bins * bins)
+    low, high = 1, int(counts.max())
+    while low < high:
+        quota = (low + high + 1) // 2
+        if np.minimum(counts, quota).sum() <= budget:
+            low = quota
+        else:
+            high = quota - 1
+    quota = low
+
+    # 무작위 순서에서 칸 안의 순번이 quota 미만인 점만 남김
+    order = np.random.default_rng(seed).permutation(len(x))
+    shuffled = cells[order]
+    by_cell = np.argsort(shuffled, kind='stable')
+    sorted_cells = shuffled[by_cell]
+    starts = np.r_[0, np.flatnonzero(np.diff(sorted_cells)) + 1]
+    ranks = np.arange(len(sorted_cells)) - np.repeat(starts, np.diff(np.r_[starts, len(sorted_cells)]))
+    keep = order[by_cell[ranks < quota]]
+    return x[keep], y[keep]
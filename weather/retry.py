@@ -0,0 +1,103 @@
+import glob
+import logging
+import os
+import random
+import time
+from datetime import datetime
+import pandas as pd
+from weather import ingest
+from weather.aggregate import AGGREGATE_PROCESSES, AggregatePool
+from weather.db import FUTURE_TABLE_NAME
+from weather.metrics import RunMetrics
+from weather.watermarks import plan_past_fetch, plan_forecast_fetch, last_complete_date, record_empty_stations
+
+# 실패 스테이션 재시도 설정
+RETRY_MAX_ATTEMPTS = int(os.getenv("RETRY_MAX_ATTEMPTS", "4"))  # 재시도 라운드 수
+RETRY_BASE_DELAY = float(os.getenv("RETRY_BASE_DELAY", "5"))  # 첫 대기 시간 상한 (초), 라운드마다 2배
+RETRY_MAX_DELAY = float(os.getenv("RETRY_MAX_DELAY", "300"))  # 대기 시간 상한 (초)
+
+# 라운드를 반복해 재시도하는 오류 종류 (그 외 오류는 라운드 한 번만 다시 시도)
+RETRYABLE_ERRORS = ('transient', 'timeout')
+
+
+# 지수 백오프 + full jitter: 0 ~ min(max_delay, base * 2^attempt) 사이 임의 대기
+def backoff_delay(attempt, base_delay=RETRY_BASE_DELAY, max_delay=RETRY_MAX_DELAY):
+    return random.uniform(0, min(max_delay, base_delay * 2 ** attempt))
+
+
+# 가장 최근 실패 리포트 경로 (없으면 None)
+def latest_failure_report(log_dir=None):
+    reports = list_failure_reports(log_dir)
+    return reports[0] if reports else None
+
+
+# 실패 리포트 목록 (최신순)
+def list_failure_reports(log_dir=None):
+    pattern = os.path.join(log_dir or ingest.LOG_DIR, "failed_stations_*.csv")
+    return sorted(glob.glob(pattern), reverse=True)
+
+
+# 실패 리포트 읽기 (Error Type 열이 없는 이전 리포트는 모두 재시도 대상)
+def load_failure_report(path):
+    report = pd.read_csv(path, dtype={'Station ID': str})
+    if 'Error Type' not in report:
+        report['Error Type'] = 'error'
+    return report
+
+
+# 실패 리포트의 스테이션만 다시 수집 (빈 데이터 스테이션은 제외, 일시 오류/타임아웃은 백오프하며 재시도)
+def retry_failed_stations(conn, report_path, table_name, start_date, end_date, bulk_load=False, incremental=True,
+                          hourly_store=None, max_workers=ingest.FETCH_MAX_WORKERS, timeout=ingest.FETCH_TIMEOUT,
+                          rate_limit=ingest.FETCH_RATE_LIMIT, chunk_size=ingest.STREAM_CHUNK_SIZE,
+                          processes=AGGREGATE_PROCESSES, max_attempts=RETRY_MAX_ATTEMPTS,
+                          base_delay=RETRY_BASE_DELAY, progress=None, progress_interval=ingest.PROGRESS_INTERVAL):
+    report = load_failure_report(report_path)
+    retry_ids = report.loc[report['Error Type'] != 'empty', 'Station ID'].unique().tolist()
+    logging.info(f"Retrying {len(retry_ids)} of {len(report)} failed stations from {report_path}")
+
+    with RunMetrics('retry', table_name) as metrics:
+        stations = ingest.select_stations()
+        stations = stations.loc[stations.index.intersection(retry_ids)]
+        forecast = table_name == FUTURE_TABLE_NAME
+
+        station_starts = None
+        if incremental:
+            # 다른 실행에서 이미 채워진 스테이션/구간은 제외
+            if forecast:
+                stations, _ = plan_forecast_fetch(conn, table_name, stations, start_date, end_date)
+            else:
+                stations, station_starts = plan_past_fetch(conn, table_name, stations, start_date, end_date)
+
+        if forecast:
+            write_chunk = ingest.make_chunk_writer(
+                conn, table_name, bulk_load, issued_at=datetime.now(), metrics=metrics)
+        else:
+            write_chunk = ingest.make_chunk_writer(
+                conn, table_name, bulk_load, complete_through=last_complete_date(end_date), metrics=metrics)
+
+        write_results = []
+        failed_stations = []
+        remaining = stations
+        attempts = max(1, max_attempts)  # 라운드는 최소 한 번
+        # 집계 프로세스 풀은 한 번만 띄워 모든 라운드에서 재사용
+        with AggregatePool(processes, metrics) as pool:
+            for attempt in range(attempts):
+                if attempt:
+                    delay = backoff_delay(attempt - 1, base_delay)
+                    logging.info(f"Retry round {attempt + 1}: {len(remaining)} stations after {delay:.1f}s")
+                    time.sleep(delay)
+                results, round_failed = ingest.run_ingest_pipeline(
+                    start_date, end_date, write_chunk, max_workers, timeout, rate_limit, chunk_size,
+                    remaining, station_starts, hourly_store, progress, progress_interval, processes, metrics, pool)
+                write_results += results
+
+                # 일시 오류만 다음 라운드에서 재시도 (빈 데이터/기타 오류는 다시 받아도 같으므로 확정)
+                failed_stations += [failed for failed in round_failed if failed[3] not in RETRYABLE_ERRORS]
+                retryable = [failed for failed in round_failed if failed[3] in RETRYABLE_ERRORS]
+                if not retryable or attempt == attempts - 1:
+                    failed_stations += retryable
+                    break
+                remaining = remaining.loc[[failed[0] for failed in retryable]]
+
+        record_empty_stations(conn, table_name, ingest.empty_station_ids(failed_stations))
+        return ingest.summarize_results(write_results, failed_stations, len(stations), metrics)
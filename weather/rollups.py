@@ -0,0 +1,73 @@
+import numpy as np
+import pandas as pd
+from weather.db import date_range_condition
+from weather.schema import STATIONS_TABLE, ROLLUP_MEASURES, rollup_table_name, rollup_upsert_sql
+
+
+# 기록된 행이 속한 (지역, 날짜) 그룹만 롤업 재계산 (업서트는 기존 값을 덮어쓰므로 증분 합산 대신 해당 그룹만 재집계)
+def refresh_rollups(conn, table_name, data):
+    if data.empty:
+        return
+    station_ids = data['Station_ID'].astype(str)
+    unique_ids = station_ids.unique().tolist()
+    with conn.cursor() as cur:
+        cur.execute(
+            f"SELECT Station_ID, Region FROM {STATIONS_TABLE} WHERE Station_ID IN ({', '.join(['%s'] * len(unique_ids))})",
+            unique_ids)
+        regions = {row['Station_ID']: row['Region'] or '' for row in cur.fetchall()}
+
+    # 롤업과 같은 기준 (지역이 없으면 '')
+    pairs = pd.DataFrame({
+        'Region': station_ids.map(regions).fillna('').to_numpy(),
+        'Date': pd.to_datetime(data['Date']).dt.date.to_numpy(),
+    }).drop_duplicates()
+    dates = sorted(pairs['Date'].unique())
+    # Date 조건으로 (Date, Station_ID) 인덱스 범위를 좁히고, 그 안에서 기록된 그룹만 남김
+    where_clause = f"""
+        WHERE w.Date IN ({", ".join(["%s"] * len(dates))})
+          AND (COALESCE(s.Region, ''), w.Date) IN ({", ".join(["(%s, %s)"] * len(pairs))})
+    """
+    params = dates + [value for pair in pairs.itertuples(index=False, name=None) for value in pair]
+    with conn.cursor() as cur:
+        cur.execute(rollup_upsert_sql(table_name, where_clause), params)
+    conn.commit()
+
+
+# 롤업 테이블에서 describe()와 같은 형태의 요약 통계 계산 (count, mean, std, min, max)
+def load_rollup_summary(conn, table_name, start_date=None, end_date=None, regions=None, measures=ROLLUP_MEASURES):
+    measures = [m for m in measures if m in ROLLUP_MEASURES]
+    select_list = ", ".join(
+        f"SUM({m}_count) AS {m}_count, SUM({m}_sum) AS {m}_sum, SUM({m}_sumsq) AS {m}_sumsq, "
+        f"MIN({m}_min) AS {m}_min, MAX({m}_max) AS {m}_max"
+        for m in measures
+    )
+    query = f"SELECT {select_list} FROM {rollup_table_name(table_name)}"
+    conditions, params = date_range_condition(start_date, end_date)
+    if regions:
+        conditions.append(f"Region IN ({', '.join(['%s'] * len(regions))})")
+        params.extend(regions)
+    if conditions:
+        query += " WHERE " + " AND ".join(conditions)
+
+    with conn.cursor() as cursor:
+        cursor.execute(query, params)
+        row = cursor.fetchone() or {}
+
+    summary = []
+    for m in measures:
+        count = float(row.get(f"{m}_count") or 0)
+        total = float(row.get(f"{m}_sum") or 0)
+        sumsq = float(row.get(f"{m}_sumsq") or 0)
+        mean = total / count if count else np.nan
+        # 표본 표준편차 (describe와 동일하게 ddof=1)
+        std = np.sqrt(max(sumsq - total * total / count, 0.0) / (count - 1)) if count > 1 else np.nan
+        minimum = row.get(f"{m}_min")
+        maximum = row.get(f"{m}_max")
+        summary.append({
+            'count': count,
+            'mean': mean,
+            'std': std,
+            'min': np.nan if minimum is None else float(minimum),
+            'max': np.nan if maximum is None else float(maximum),
+        })
+    return pd.DataFrame(summary, index=measures)
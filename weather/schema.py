@@ -0,0 +1,364 @@
+import logging
+import os
+from datetime import date
+
+# 월 단위 RANGE 파티셔닝 사용 여부 (선택)
+DB_PARTITION_BY_MONTH = os.getenv("DB_PARTITION_BY_MONTH", "0") == "1"
+DB_PARTITION_MONTHS_AHEAD = int(os.getenv("DB_PARTITION_MONTHS_AHEAD", "3"))  # 미리 만들어 둘 미래 파티션 수
+
+# 날씨 사실(fact) 테이블
+WEATHER_TABLES = ("past_weather", "future_weather")
+
+# 스테이션 차원(dimension) 테이블과 메타데이터 열
+STATIONS_TABLE = "stations"
+STATION_COLUMNS = ['Station_Name', 'Country', 'Region', 'WMO', 'ICAO', 'Latitude', 'Longitude', 'Elevation', 'Timezone']
+
+# (Region, Date) 단위 요약 통계 롤업 대상 측정값
+ROLLUP_MEASURES = ['tavg', 'tmin', 'tmax', 'prcp', 'snow', 'avg_wdir', 'pres', 'tsun', 'avg_rhum', 'avg_dwpt']
+ROLLUP_STATS = ['count', 'sum', 'sumsq', 'min', 'max']
+
+# 증분 수집용 스테이션별 워터마크 테이블
+WATERMARKS_TABLE = "ingest_watermarks"
+
+# 여러 워커가 나눠 처리하는 수집 작업 큐 (작업 1개 = 스테이션 작업 항목 여러 개)
+JOBS_TABLE = "ingest_jobs"
+JOB_ITEMS_TABLE = "ingest_job_items"
+
+# 테이블별 데이터 버전 (기록할 때마다 증가, 다른 프로세스의 조회 캐시가 바뀐 데이터를 알아챔)
+DATA_VERSIONS_TABLE = "data_versions"
+
+MIGRATION_LOCK_NAME = "weather_schema_migration"
+
+
+# 날씨 테이블 생성 (Station_ID는 인덱스 가능한 VARCHAR, Date 범위 조회용 보조 인덱스)
+def create_weather_tables(cur):
+    for table_name in WEATHER_TABLES:
+        cur.execute(f"""
+        CREATE TABLE IF NOT EXISTS {table_name} (
+            Station_ID VARCHAR(16) NOT NULL,
+            Station_Name VARCHAR(255),
+            Country VARCHAR(8),
+            Region VARCHAR(16),
+            WMO VARCHAR(16),
+            ICAO VARCHAR(16),
+            Latitude REAL,
+            Longitude REAL,
+            Elevation REAL,
+            Timezone VARCHAR(64),
+            Date DATE NOT NULL,
+            tavg REAL,
+            tmin REAL,
+            tmax REAL,
+            prcp REAL,
+            snow REAL,
+            avg_wdir REAL,
+            wspd REAL,
+            pres REAL,
+            tsun REAL,
+            avg_rhum REAL,
+            avg_dwpt REAL,
+            PRIMARY KEY (Station_ID, Date),
+            KEY idx_date_station (Date, Station_ID)
+        )
+        """)
+
+
+# 이전 initialize_db로 만들어진 테이블(TEXT 키, Date 인덱스 없음)을 새 형식으로 변경
+def retype_legacy_weather_tables(cur):
+    for table_name in WEATHER_TABLES:
+        cur.execute("""
+            SELECT DATA_TYPE AS data_type FROM information_schema.COLUMNS
+            WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND COLUMN_NAME = 'Station_ID'
+        """, (table_name,))
+        column = cur.fetchone()
+        if column and column['data_type'].lower() == 'text':
+            cur.execute(f"""
+                ALTER TABLE {table_name}
+                    MODIFY Station_ID VARCHAR(16) NOT NULL,
+                    MODIFY Station_Name VARCHAR(255),
+                    MODIFY Country VARCHAR(8),
+                    MODIFY Region VARCHAR(16),
+                    MODIFY WMO VARCHAR(16),
+                    MODIFY ICAO VARCHAR(16),
+                    MODIFY Timezone VARCHAR(64),
+                    MODIFY Date DATE NOT NULL
+            """)
+
+        cur.execute("""
+            SELECT COUNT(*) AS index_count FROM information_schema.STATISTICS
+            WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND INDEX_NAME = 'idx_date_station'
+        """, (table_name,))
+        if cur.fetchone()['index_count'] == 0:
+            cur.execute(f"ALTER TABLE {table_name} ADD KEY idx_date_station (Date, Station_ID)")
+
+
+# 스테이션 메타데이터를 stations 테이블로 분리하고 날씨 테이블은 Station_ID + Date + 측정값만 유지
+def normalize_station_metadata(cur):
+    cur.execute(f"""
+    CREATE TABLE IF NOT EXISTS {STATIONS_TABLE} (
+        Station_ID VARCHAR(16) NOT NULL PRIMARY KEY,
+        Station_Name VARCHAR(255),
+        Country VARCHAR(8),
+        Region VARCHAR(16),
+        WMO VARCHAR(16),
+        ICAO VARCHAR(16),
+        Latitude REAL,
+        Longitude REAL,
+        Elevation REAL,
+        Timezone VARCHAR(64),
+        updated_at DATETIME DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+        KEY idx_region (Region)
+    )
+    """)
+
+    columns = ", ".join(STATION_COLUMNS)
+    for table_name in WEATHER_TABLES:
+        # 기존 행의 메타데이터로 stations 채우기
+        cur.execute(f"""
+            INSERT IGNORE INTO {STATIONS_TABLE} (Station_ID, {columns})
+            SELECT Station_ID, {", ".join(f"MAX({col})" for col in STATION_COLUMNS)}
+            FROM {table_name}
+            GROUP BY Station_ID
+        """)
+        cur.execute(f"ALTER TABLE {table_name} " + ", ".join(f"DROP COLUMN {col}" for col in STATION_COLUMNS))
+
+
+# 날씨 테이블별 롤업 테이블 이름
+def rollup_table_name(table_name):
+    return f"{table_name}_region_rollup"
+
+
+# 날씨 테이블 -> 롤업 테이블 재계산 쿼리 (where_clause로 대상 범위 제한)
+def rollup_upsert_sql(table_name, where_clause=""):
+    rollup_columns = [f"{measure}_{stat}" for measure in ROLLUP_MEASURES for stat in ROLLUP_STATS]
+    aggregates = ",\n            ".join(
+        f"COUNT(w.{m}), SUM(w.{m}), SUM(w.{m} * w.{m}), MIN(w.{m}), MAX(w.{m})" for m in ROLLUP_MEASURES
+    )
+    updates = ", ".join(f"{col}=VALUES({col})" for col in rollup_columns)
+    return f"""
+        INSERT INTO {rollup_table_name(table_name)} (Region, Date, {", ".join(rollup_columns)})
+        SELECT COALESCE(s.Region, ''), w.Date,
+            {aggregates}
+        FROM {table_name} w
+        LEFT JOIN {STATIONS_TABLE} s ON s.Station_ID = w.Station_ID
+        {where_clause}
+        GROUP BY COALESCE(s.Region, ''), w.Date
+        ON DUPLICATE KEY UPDATE {updates}
+    """
+
+
+# 요약 통계용 (Region, Date) 롤업 테이블 생성 및 기존 데이터로 채우기
+def create_region_rollups(cur):
+    stat_types = {'count': "INT NOT NULL DEFAULT 0", 'sum': "DOUBLE", 'sumsq': "DOUBLE", 'min': "DOUBLE", 'max': "DOUBLE"}
+    for table_name in WEATHER_TABLES:
+        columns = ",\n            ".join(
+            f"{measure}_{stat} {stat_types[stat]}" for measure in ROLLUP_MEASURES for stat in ROLLUP_STATS
+        )
+        cur.execute(f"""
+        CREATE TABLE IF NOT EXISTS {rollup_table_name(table_name)} (
+            Region VARCHAR(16) NOT NULL,
+            Date DATE NOT NULL,
+            {columns},
+            PRIMARY KEY (Date, Region)
+        )
+        """)
+        cur.execute(rollup_upsert_sql(table_name))
+
+
+# 스테이션 x 테이블별 수집 워터마크 (마지막 완전 수집 날짜, 마지막 예보 수집 시각)
+def create_ingest_watermarks(cur):
+    cur.execute(f"""
+    CREATE TABLE IF NOT EXISTS {WATERMARKS_TABLE} (
+        table_name VARCHAR(64) NOT NULL,
+        Station_ID VARCHAR(16) NOT NULL,
+        last_date DATE,
+        last_issued_at DATETIME,
+        updated_at DATETIME DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+        PRIMARY KEY (table_name, Station_ID)
+    )
+    """)
+    # 기존 데이터의 마지막 날짜는 일부 시간만 수집됐을 수 있으므로 하루 전까지를 완료로 간주
+    for table_name in WEATHER_TABLES:
+        cur.execute(f"""
+            INSERT IGNORE INTO {WATERMARKS_TABLE} (table_name, Station_ID, last_date)
+            SELECT %s, Station_ID, MAX(Date) - INTERVAL 1 DAY
+            FROM {table_name}
+            GROUP BY Station_ID
+        """, (table_name,))
+
+
+# 없는 열만 추가 (DDL은 바로 커밋되므로, 버전 기록 전에 중단된 마이그레이션을 다시 실행해도 실패하지 않게)
+def add_missing_columns(cur, table_name, column_definitions):
+    cur.execute("""
+        SELECT COLUMN_NAME AS column_name FROM information_schema.COLUMNS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s
+    """, (table_name,))
+    existing = {row['column_name'].lower() for row in cur.fetchall()}
+    missing = [(name, definition) for name, definition in column_definitions if name.lower() not in existing]
+    if missing:
+        cur.execute(f"ALTER TABLE {table_name} "
+                    + ", ".join(f"ADD COLUMN {name} {definition}" for name, definition in missing))
+
+
+# 데이터가 계속 비어 있는 스테이션 추적 (연속 빈 응답 횟수, 마지막 빈 응답 시각)
+def add_empty_station_tracking(cur):
+    add_missing_columns(cur, WATERMARKS_TABLE, [
+        ('empty_runs', "INT NOT NULL DEFAULT 0"),
+        ('last_empty_at', "DATETIME"),
+    ])
+
+
+# 수집 작업 큐 (워커는 SELECT ... FOR UPDATE SKIP LOCKED로 항목을 나눠 가짐, MySQL 8.0 이상)
+def create_ingest_jobs(cur):
+    cur.execute(f"""
+    CREATE TABLE IF NOT EXISTS {JOBS_TABLE} (
+        job_id BIGINT NOT NULL AUTO_INCREMENT PRIMARY KEY,
+        table_name VARCHAR(64) NOT NULL,
+        start_date DATETIME NOT NULL,
+        end_date DATETIME NOT NULL,
+        status VARCHAR(16) NOT NULL DEFAULT 'running',
+        station_count INT NOT NULL DEFAULT 0,
+        created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+        finished_at DATETIME,
+        KEY idx_status (status, created_at)
+    )
+    """)
+    cur.execute(f"""
+    CREATE TABLE IF NOT EXISTS {JOB_ITEMS_TABLE} (
+        job_id BIGINT NOT NULL,
+        Station_ID VARCHAR(16) NOT NULL,
+        Station_Name VARCHAR(255),
+        fetch_start DATETIME,
+        status VARCHAR(16) NOT NULL DEFAULT 'pending',
+        worker_id VARCHAR(128),
+        claimed_at DATETIME,
+        finished_at DATETIME,
+        attempts INT NOT NULL DEFAULT 0,
+        rows_written INT NOT NULL DEFAULT 0,
+        error TEXT,
+        error_type VARCHAR(16),
+        PRIMARY KEY (job_id, Station_ID),
+        KEY idx_claim (job_id, status, claimed_at)
+    )
+    """)
+
+
+# 측정값 내용 해시 열 (같은 값이면 다시 쓰지 않음)
+def add_row_hash(cur):
+    for table_name in WEATHER_TABLES:
+        add_missing_columns(cur, table_name, [('row_hash', "BIGINT")])
+
+
+# 테이블별 데이터 버전
+def create_data_versions(cur):
+    cur.execute(f"""
+    CREATE TABLE IF NOT EXISTS {DATA_VERSIONS_TABLE} (
+        table_name VARCHAR(64) NOT NULL PRIMARY KEY,
+        version BIGINT NOT NULL DEFAULT 0,
+        updated_at DATETIME DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+    )
+    """)
+
+
+# 버전별 스키마 마이그레이션 (순서대로 한 번씩만 적용)
+MIGRATIONS = [
+    (1, "create weather tables", create_weather_tables),
+    (2, "typed keys and (Date, Station_ID) index", retype_legacy_weather_tables),
+    (3, "stations dimension table", normalize_station_metadata),
+    (4, "(Region, Date) summary rollups", create_region_rollups),
+    (5, "per-station ingest watermarks", create_ingest_watermarks),
+    (6, "empty-station tracking on watermarks", add_empty_station_tracking),
+    (7, "ingest job queue", create_ingest_jobs),
+    (8, "content hash on weather rows", add_row_hash),
+    (9, "per-table data versions", create_data_versions),
+]
+
+
+# 적용되지 않은 마이그레이션 실행
+def run_migrations(conn):
+    with conn.cursor() as cur:
+        # 여러 프로세스가 동시에 마이그레이션하지 않도록 잠금
+        cur.execute("SELECT GET_LOCK(%s, 60) AS acquired", (MIGRATION_LOCK_NAME,))
+        if not cur.fetchone()['acquired']:
+            raise TimeoutError("Timed out waiting for the schema migration lock")
+        try:
+            cur.execute("""
+            CREATE TABLE IF NOT EXISTS schema_version (
+                version INT PRIMARY KEY,
+                description VARCHAR(255),
+                applied_at DATETIME DEFAULT CURRENT_TIMESTAMP
+            )
+            """)
+            cur.execute("SELECT version FROM schema_version")
+            applied = {row['version'] for row in cur.fetchall()}
+
+            for version, description, migrate in MIGRATIONS:
+                if version in applied:
+                    continue
+                logging.info(f"Applying schema migration {version}: {description}")
+                migrate(cur)
+                cur.execute(
+                    "INSERT INTO schema_version (version, description) VALUES (%s, %s)",
+                    (version, description)
+                )
+                conn.commit()
+        finally:
+            cur.execute("SELECT RELEASE_LOCK(%s)", (MIGRATION_LOCK_NAME,))
+
+
+# 월 경계 목록 (start가 속한 달부터 end가 속한 달의 다음 달까지)
+def month_boundaries(start, end):
+    current = date(start.year, start.month, 1)
+    boundaries = []
+    while current <= end:
+        current = date(current.year + current.month // 12, current.month % 12 + 1, 1)
+        boundaries.append(current)
+    return boundaries
+
+
+# 파티션 이름은 담고 있는 달 기준 (예: 2025-03-01 미만 -> p202502)
+def partition_definitions(boundaries):
+    definitions = []
+    for boundary in boundaries:
+        month = boundary.month - 1 or 12
+        year = boundary.year if boundary.month > 1 else boundary.year - 1
+        definitions.append(f"PARTITION p{year}{month:02d} VALUES LESS THAN ('{boundary.isoformat()}')")
+    return ",\n".join(definitions)
+
+
+# Date 기준 월별 RANGE 파티션 생성/연장 (DB_PARTITION_BY_MONTH=1일 때)
+def ensure_month_partitions(conn, table_name, months_ahead=DB_PARTITION_MONTHS_AHEAD):
+    today = date.today()
+    horizon = date(today.year + (today.month - 1 + months_ahead) // 12, (today.month - 1 + months_ahead) % 12 + 1, 1)
+
+    with conn.cursor() as cur:
+        cur.execute("""
+            SELECT PARTITION_NAME AS name, PARTITION_DESCRIPTION AS bound FROM information_schema.PARTITIONS
+            WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND PARTITION_NAME IS NOT NULL
+            ORDER BY PARTITION_ORDINAL_POSITION
+        """, (table_name,))
+        partitions = cur.fetchall()
+
+        if not partitions:
+            cur.execute(f"SELECT MIN(Date) AS first_date FROM {table_name}")
+            first_date = cur.fetchone()['first_date'] or today
+            boundaries = month_boundaries(first_date, horizon)
+            cur.execute(f"""
+                ALTER TABLE {table_name} PARTITION BY RANGE COLUMNS(Date) (
+                    {partition_definitions(boundaries)},
+                    PARTITION pmax VALUES LESS THAN (MAXVALUE)
+                )
+            """)
+        else:
+            # pmax 앞의 마지막 월 경계 다음부터 horizon까지 파티션 추가
+            bounded = [p for p in partitions if p['name'] != 'pmax']
+            last_bound = date.fromisoformat(bounded[-1]['bound'].strip("'")) if bounded else today
+            if last_bound <= horizon:
+                boundaries = month_boundaries(last_bound, horizon)
+                cur.execute(f"""
+                    ALTER TABLE {table_name} REORGANIZE PARTITION pmax INTO (
+                        {partition_definitions(boundaries)},
+                        PARTITION pmax VALUES LESS THAN (MAXVALUE)
+                    )
+                """)
+    conn.commit()
@@ -0,0 +1,141 @@
+import logging
+import os
+from datetime import datetime, timedelta
+from weather.aggregate import HOUR_COUNT_COLUMN
+from weather.schema import WATERMARKS_TABLE
+
+# 최근 이 시간 안에 수집한 예보는 다시 받지 않음
+FORECAST_REFRESH_HOURS = float(os.getenv("FORECAST_REFRESH_HOURS", "6"))
+
+# 연속으로 이 횟수만큼 빈 데이터를 돌려준 스테이션은 건너뜀 (EMPTY_RECHECK_DAYS마다 다시 확인)
+EMPTY_SKIP_RUNS = int(os.getenv("EMPTY_SKIP_RUNS", "3"))
+EMPTY_RECHECK_DAYS = float(os.getenv("EMPTY_RECHECK_DAYS", "30"))
+
+# 과거 데이터는 Hourly 행이 FULL_DAY_HOURS개 모두 들어온 날까지만 완료로 봄.
+# WATERMARK_SETTLE_DAYS가 지난 날은 더 게시되지 않을 것으로 보고 행이 모자라도 완료 (관측 공백이 있는 스테이션)
+FULL_DAY_HOURS = 24
+WATERMARK_SETTLE_DAYS = float(os.getenv("WATERMARK_SETTLE_DAYS", "3"))
+
+
+# 테이블의 스테이션별 워터마크 조회 {Station_ID: (last_date, last_issued_at)}
+def load_watermarks(conn, table_name):
+    with conn.cursor() as cur:
+        cur.execute(
+            f"SELECT Station_ID, last_date, last_issued_at FROM {WATERMARKS_TABLE} WHERE table_name = %s",
+            (table_name,)
+        )
+        return {row['Station_ID']: (row['last_date'], row['last_issued_at']) for row in cur.fetchall()}
+
+
+# 계속 데이터가 없어 이번 실행에서 건너뛸 스테이션
+def load_empty_stations(conn, table_name, skip_runs=EMPTY_SKIP_RUNS, recheck_days=EMPTY_RECHECK_DAYS):
+    with conn.cursor() as cur:
+        cur.execute(f"""
+            SELECT Station_ID FROM {WATERMARKS_TABLE}
+            WHERE table_name = %s AND empty_runs >= %s AND last_empty_at >= %s
+        """, (table_name, skip_runs, datetime.now() - timedelta(days=recheck_days)))
+        return {row['Station_ID'] for row in cur.fetchall()}
+
+
+# 빈 데이터를 돌려준 스테이션 기록 (데이터가 기록되면 update_watermarks에서 0으로 초기화)
+def record_empty_stations(conn, table_name, station_ids):
+    rows = [(table_name, station_id) for station_id in station_ids]
+    if not rows:
+        return
+    with conn.cursor() as cur:
+        cur.executemany(f"""
+            INSERT INTO {WATERMARKS_TABLE} (table_name, Station_ID, empty_runs, last_empty_at)
+            VALUES (%s, %s, 1, NOW())
+            ON DUPLICATE KEY UPDATE
+                empty_runs = empty_runs + 1,
+                last_empty_at = VALUES(last_empty_at)
+        """, rows)
+    conn.commit()
+
+
+# 수집 구간 [start, end]에서 하루 전체(23시까지)가 포함된 마지막 날짜
+def last_complete_date(end_date):
+    return (end_date - timedelta(hours=23)).date()
+
+
+# 과거 데이터: 워터마크가 요청 구간 안에 있으면 그 다음 날부터만 수집, 계속 비어 있으면 제외
+# 워터마크가 구간 끝 이후인 스테이션(과거 구간 백필, 재수집)은 건너뛰지 않고 구간 전체를 수집
+def plan_past_fetch(conn, table_name, stations, start_date, end_date):
+    watermarks = load_watermarks(conn, table_name)
+    empty_stations = load_empty_stations(conn, table_name)
+    station_starts = {}
+    keep = []
+    past_window = 0
+    for station_id in stations.index:
+        if station_id in empty_stations:
+            continue
+        keep.append(station_id)
+        last_date, _ = watermarks.get(station_id, (None, None))
+        if last_date is None or last_date < start_date.date():
+            continue
+        if last_date >= end_date.date():
+            past_window += 1
+            continue
+        station_starts[station_id] = datetime.combine(last_date + timedelta(days=1), datetime.min.time())
+    if past_window:
+        logging.warning(f"{past_window} stations in {table_name} have a watermark at or after {end_date:%Y-%m-%d}; "
+                        f"fetching the whole window for them")
+    return stations.loc[keep], station_starts
+
+
+# 예보 데이터: 최근 FORECAST_REFRESH_HOURS 안에 요청 기간 끝까지 수집했거나 계속 비어 있는 스테이션은 제외
+def plan_forecast_fetch(conn, table_name, stations, start_date, end_date, refresh_hours=FORECAST_REFRESH_HOURS):
+    watermarks = load_watermarks(conn, table_name)
+    empty_stations = load_empty_stations(conn, table_name)
+    fresh_after = datetime.now() - timedelta(hours=refresh_hours)
+    keep = []
+    for station_id in stations.index:
+        if station_id in empty_stations:
+            continue
+        last_date, last_issued_at = watermarks.get(station_id, (None, None))
+        if last_issued_at is not None and last_issued_at >= fresh_after \
+                and last_date is not None and last_date >= end_date.date():
+            continue
+        keep.append(station_id)
+    return stations.loc[keep], {}
+
+
+# 최근 날짜 중 Hourly 행이 모자란 첫 날 {Station_ID: Date} (meteostat이 아직 다 게시하지 않은 날)
+def first_partial_dates(data, full_day_hours=FULL_DAY_HOURS, settle_days=WATERMARK_SETTLE_DAYS):
+    if HOUR_COUNT_COLUMN not in data:
+        return {}
+    settled_through = (datetime.now() - timedelta(days=settle_days)).date()
+    partial = data[(data[HOUR_COUNT_COLUMN] < full_day_hours) & (data['Date'] > settled_through)]
+    return partial.groupby('Station_ID', observed=True)['Date'].min().to_dict()
+
+
+# 기록이 끝난 청크의 스테이션 워터마크 갱신
+def update_watermarks(conn, table_name, data, complete_through=None, issued_at=None, exclude_stations=()):
+    """complete_through가 있으면 (과거 데이터) 그 날짜 이후와, 하루치 Hourly 행이 다 들어오지 않은 첫 날부터는
+    완료로 보지 않음 -> 다음 증분 수집에서 다시 받음"""
+    if data.empty:
+        return
+    last_dates = data.groupby('Station_ID', observed=True)['Date'].max()
+    partial_dates = first_partial_dates(data) if complete_through is not None else {}
+    rows = []
+    for station_id, last_date in last_dates.items():
+        if station_id in exclude_stations:
+            continue
+        if complete_through is not None:
+            last_date = min(last_date, complete_through)
+        if station_id in partial_dates:
+            last_date = min(last_date, partial_dates[station_id] - timedelta(days=1))
+        rows.append((table_name, station_id, last_date, issued_at))
+    if not rows:
+        return
+
+    with conn.cursor() as cur:
+        cur.executemany(f"""
+            INSERT INTO {WATERMARKS_TABLE} (table_name, Station_ID, last_date, last_issued_at)
+            VALUES (%s, %s, %s, %s)
+            ON DUPLICATE KEY UPDATE
+                last_date = GREATEST(COALESCE(last_date, VALUES(last_date)), VALUES(last_date)),
+                last_issued_at = COALESCE(VALUES(last_issued_at), last_issued_at),
+                empty_runs = 0
+        """, rows)
+    conn.commit()